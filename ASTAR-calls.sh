@@ -1,6 +1,7 @@
 #!/bin/bash
 
 # Debe ejecutarse desde la raiz del proyecto
+# (python3 ASTARBatch.py ASTAR-test/*.csv --modes 1 2 --write lanza lo mismo en paralelo)
 
 # Mapa easy 2
 echo "################# easy2 #################"
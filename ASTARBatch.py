@@ -0,0 +1,185 @@
+from ASTARTraslados import *
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import json
+import signal
+
+TIMEOUT = 300  # Segundos maximos por ejecucion
+MODES = [1, 2]
+BATCH_OUTPUT = OUTPUT_PATH + "batch.csv"
+
+
+class JobTimeout(Exception):
+    """Se lanza dentro del proceso trabajador cuando una ejecucion agota su tiempo"""
+
+
+def on_timeout(signum, frame):
+    raise JobTimeout()
+
+
+def run_job(
+    file_name: str,
+    mode: int,
+    engine: str = ENGINE,
+    timeout: float = TIMEOUT,
+    write: bool = False,
+    workers: int = None,
+    cache_path: str = MAP_CACHE_PATH,
+    pdb_path: str = PDB_PATH,
+) -> dict:
+    """
+    Resuelve un mapa con un modo de heuristica en el proceso actual y devuelve una fila de resultados con
+    los mismos datos que export_info y el tiempo de preparacion del mapa. El tiempo limite se aplica con
+    una alarma dentro del propio proceso, de forma que un trabajo que lo agota no bloquea al trabajador
+    para los siguientes. workers fija los procesos del motor hda; cache_path y pdb_path a None preparan
+    el mapa desde cero, sin la cache de mapas ni las tablas de patrones guardadas
+    """
+    row = {"Mapa": file_name, "Modo": mode, "Estado": "ok"}
+    signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        inicio_tiempo = time.time()
+        map = Map(file_name, mode, cache_path=cache_path, pdb_path=pdb_path)
+        row["Tiempo de preparacion"] = time.time() - inicio_tiempo
+        astar_traslados = ASTARTraslados(file_name, mode, map=map)
+        astar_traslados.engine = engine
+        if workers:
+            astar_traslados.workers = workers
+
+        inicio_tiempo = time.time()
+        resultado = astar_traslados.search()
+        total_time = time.time() - inicio_tiempo
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+        # Reescala los costes
+        rescale(resultado, astar_traslados.map.heuristic_escale)
+
+        cost = resultado[-1].g if resultado else None
+        if not resultado:
+            row["Estado"] = "sin solucion"
+        elif write:
+            writeResults(file_name, astar_traslados, resultado, total_time)
+        row.update(
+            astar_traslados.info(
+                total_time, cost, len(resultado), astar_traslados.expanded
+            )
+        )
+    except JobTimeout:
+        row["Estado"] = "timeout"
+    except Exception as e:
+        row["Estado"] = f"error: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return row
+
+
+def run_batch(
+    maps: list,
+    modes: list,
+    engine: str = ENGINE,
+    timeout: float = TIMEOUT,
+    workers: int = None,
+    write: bool = False,
+) -> list:
+    """
+    Ejecuta todas las combinaciones mapa x modo en paralelo (un proceso por nucleo por defecto) y
+    devuelve las filas en el mismo orden en el que se pidieron
+    """
+    jobs = [(file_name, int(mode)) for file_name in maps for mode in modes]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_job, file_name, mode, engine, timeout, write)
+            for file_name, mode in jobs
+        ]
+        return [future.result() for future in futures]
+
+
+def export_table(rows: list, output_file: str) -> None:
+    """
+    Escribe la tabla agregada en CSV o JSON segun la extension del fichero
+    """
+    if output_file.endswith(".json"):
+        with open(output_file, "w") as archivo:
+            json.dump(rows, archivo, indent=2)
+        return
+
+    # Las ejecuciones fallidas no tienen todas las columnas
+    columns = []
+    for row in rows:
+        columns += [column for column in row if column not in columns]
+    with open(output_file, "w", newline="") as archivo:
+        writer = csv.DictWriter(archivo, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(
+        description="Ejecuta en paralelo ASTARTraslados sobre varios mapas y modos de heuristica"
+    )
+    parser.add_argument("maps", nargs="+", type=str, help="Mapas de entrada (.csv)")
+    parser.add_argument(
+        "--modes",
+        "-m",
+        nargs="+",
+        type=int,
+        default=MODES,
+        help=f"Modos de heuristica a ejecutar sobre cada mapa (por defecto {MODES})",
+    )
+    parser.add_argument(
+        "--engine",
+        "-e",
+        type=str,
+        default=ENGINE,
+        choices=ENGINES,
+        help="Motor de busqueda (por defecto astar)",
+    )
+    parser.add_argument(
+        "--timeout",
+        "-t",
+        type=float,
+        default=TIMEOUT,
+        help=f"Segundos maximos por ejecucion (por defecto {TIMEOUT})",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="Procesos en paralelo (por defecto uno por nucleo)",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default=BATCH_OUTPUT,
+        help=f"Tabla de resultados, .csv o .json (por defecto {BATCH_OUTPUT})",
+    )
+    parser.add_argument(
+        "--write",
+        action="store_true",
+        help="Escribe tambien los ficheros .output y .stat de cada ejecucion",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+
+    inicio_tiempo = time.time()
+    rows = run_batch(
+        args.maps, args.modes, args.engine, args.timeout, args.workers, args.write
+    )
+    total_time = time.time() - inicio_tiempo
+
+    for row in rows:
+        print(
+            f"{row['Mapa']} modo {row['Modo']}: {row['Estado']}",
+            f"coste={row.get('Coste total')} expandidos={row.get('Nodos expandidos')} tiempo={row.get('Tiempo total')}",
+        )
+    print(f"TIEMPO TOTAL -> {round(total_time, 2)} segundos")
+
+    export_table(rows, args.output)
+
+
+if __name__ == "__main__":
+    main()
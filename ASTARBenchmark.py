@@ -0,0 +1,314 @@
+from ASTARBatch import *
+import glob
+import statistics
+import tracemalloc
+
+REPEAT = 3
+TIME_TOLERANCE = 0.2  # Fraccion de tiempo extra admitida antes de marcar una regresion
+TIME_MIN_DELTA = 0.05  # Segundos extra minimos para considerar regresion (evita el ruido en mapas pequeños)
+MEMORY_TOLERANCE = 0.1  # Fraccion de memoria extra admitida antes de marcar una regresion
+BENCHMARK_MAPS = OUTPUT_PATH + "*.csv"
+
+# Campos del .stat que se usan como referencia
+STAT_FIELDS = {
+    "Tiempo total": "time",
+    "Coste total": "cost",
+    "Longitud del plan": "len_path",
+    "Nodos expandidos": "expanded",
+}
+
+
+def benchmark_job(
+    file_name: str,
+    mode: int,
+    repeat: int = REPEAT,
+    engine: str = ENGINE,
+    timeout: float = TIMEOUT,
+    cache_path: str = MAP_CACHE_PATH,
+    pdb_path: str = PDB_PATH,
+) -> dict:
+    """
+    Ejecuta repeat veces un mapa con un modo y una vez mas bajo tracemalloc para medir el pico de memoria.
+    Devuelve la mediana del tiempo de busqueda y del de preparacion del mapa, los nodos expandidos, el
+    coste y el pico de memoria en bytes. cache_path y pdb_path se pasan a run_job
+    """
+    result = {"map": os.path.basename(file_name), "mode": mode, "status": "ok"}
+    times = []
+    build_times = []
+    for _ in range(repeat):
+        row = run_job(
+            file_name, mode, engine, timeout, cache_path=cache_path, pdb_path=pdb_path
+        )
+        if row["Estado"] != "ok":
+            result["status"] = row["Estado"]
+            return result
+        times.append(row["Tiempo total"])
+        build_times.append(row["Tiempo de preparacion"])
+
+    # La medicion de memoria ralentiza la busqueda, por eso va en una ejecucion aparte
+    tracemalloc.start()
+    run_job(file_name, mode, engine, timeout, cache_path=cache_path, pdb_path=pdb_path)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    result.update(
+        {
+            "time": statistics.median(times),
+            "time_min": min(times),
+            "build_time": statistics.median(build_times),
+            "cost": row["Coste total"],
+            "len_path": row["Longitud del plan"],
+            "expanded": row["Nodos expandidos"],
+            "peak_memory": peak_memory,
+        }
+    )
+    return result
+
+
+def speedup_report(
+    maps: list, modes: list, worker_counts: list, timeout: float = TIMEOUT
+) -> list:
+    """
+    Resuelve cada mapa y modo con el motor hda para cada numero de procesos y devuelve el tiempo, las
+    expansiones y la aceleracion respecto al primer numero de procesos de la lista
+    """
+    report = []
+    for file_name in maps:
+        for mode in modes:
+            base_time = None
+            for workers in worker_counts:
+                row = run_job(file_name, mode, "hda", timeout, workers=workers)
+                entry = {
+                    "map": os.path.basename(file_name),
+                    "mode": mode,
+                    "workers": workers,
+                    "status": row["Estado"],
+                }
+                if row["Estado"] == "ok":
+                    if base_time is None:
+                        base_time = row["Tiempo total"]
+                    entry.update(
+                        {
+                            "time": row["Tiempo total"],
+                            "cost": row["Coste total"],
+                            "expanded": row["Nodos expandidos"],
+                            "speedup": base_time / row["Tiempo total"],
+                        }
+                    )
+                report.append(entry)
+    return report
+
+
+def read_stat(stat_file: str) -> dict:
+    """
+    Lee un fichero .stat generado por export_info y devuelve los campos de referencia
+    """
+    values = {}
+    with open(stat_file, "r") as archivo:
+        for line in archivo:
+            name, _, value = line.partition(":")
+            if name in STAT_FIELDS:
+                values[STAT_FIELDS[name]] = float(value)
+    return values
+
+
+def load_baseline(baseline_file: str = None, maps: list = []) -> dict:
+    """
+    Carga la referencia indexada por "mapa:modo": desde un JSON guardado con --save o, si no se indica,
+    desde los ficheros .stat de ASTAR-test (mapa-modo.stat)
+    """
+    if baseline_file:
+        with open(baseline_file, "r") as archivo:
+            return {
+                f"{entry['map']}:{entry['mode']}": entry for entry in json.load(archivo)
+            }
+
+    baseline = {}
+    for file_name in maps:
+        name = os.path.splitext(os.path.basename(file_name))[0]
+        for stat_file in glob.glob(os.path.join(os.path.dirname(file_name), f"{name}-*.stat")):
+            mode = stat_file[: -len(".stat")].rsplit("-", 1)[1]
+            if mode.isdigit():
+                baseline[f"{name}.csv:{mode}"] = read_stat(stat_file)
+    return baseline
+
+
+def compare(result: dict, reference: dict) -> list:
+    """
+    Devuelve la lista de regresiones de un resultado frente a su referencia
+    """
+    regressions = []
+    if result["status"] != "ok":
+        return [result["status"]]
+    if "cost" in reference and result["cost"] > reference["cost"]:
+        regressions.append(f"coste {reference['cost']} -> {result['cost']}")
+    if "expanded" in reference and result["expanded"] > reference["expanded"]:
+        regressions.append(f"expandidos {reference['expanded']:.0f} -> {result['expanded']}")
+    if "time" in reference and result["time"] > max(
+        reference["time"] * (1 + TIME_TOLERANCE), reference["time"] + TIME_MIN_DELTA
+    ):
+        regressions.append(f"tiempo {reference['time']:.3f}s -> {result['time']:.3f}s")
+    if "peak_memory" in reference and result["peak_memory"] > reference[
+        "peak_memory"
+    ] * (1 + MEMORY_TOLERANCE):
+        regressions.append(
+            f"memoria {reference['peak_memory']} -> {result['peak_memory']} bytes"
+        )
+    return regressions
+
+
+def heuristic_modes(maps: list) -> list:
+    """
+    Devuelve los modos de Map.heuristic_functions a partir del primer mapa valido
+    """
+    for file_name in maps:
+        try:
+            return sorted(Map(file_name).heuristic_functions)
+        except ValueError:
+            continue
+    return []
+
+
+def run_benchmark(
+    maps: list,
+    modes: list,
+    repeat: int = REPEAT,
+    engine: str = ENGINE,
+    timeout: float = TIMEOUT,
+    workers: int = 1,
+    cache_path: str = MAP_CACHE_PATH,
+    pdb_path: str = PDB_PATH,
+) -> list:
+    """
+    Ejecuta el benchmark de todas las combinaciones mapa x modo. Por defecto usa un unico proceso para
+    que los tiempos no se vean afectados por otras ejecuciones
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                benchmark_job,
+                file_name,
+                mode,
+                repeat,
+                engine,
+                timeout,
+                cache_path,
+                pdb_path,
+            )
+            for file_name in maps
+            for mode in modes
+        ]
+        return [future.result() for future in futures]
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de ASTARTraslados con deteccion de regresiones frente a una referencia"
+    )
+    parser.add_argument(
+        "maps",
+        nargs="*",
+        type=str,
+        help=f"Mapas de entrada (por defecto {BENCHMARK_MAPS})",
+    )
+    parser.add_argument(
+        "--modes",
+        "-m",
+        nargs="+",
+        type=int,
+        help="Modos de heuristica (por defecto todos los de Map.heuristic_functions)",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-n",
+        type=int,
+        default=REPEAT,
+        help=f"Repeticiones por combinacion (por defecto {REPEAT})",
+    )
+    parser.add_argument(
+        "--engine",
+        "-e",
+        type=str,
+        default=ENGINE,
+        choices=ENGINES,
+        help="Motor de busqueda (por defecto astar)",
+    )
+    parser.add_argument(
+        "--timeout",
+        "-t",
+        type=float,
+        default=TIMEOUT,
+        help=f"Segundos maximos por ejecucion (por defecto {TIMEOUT})",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="Procesos en paralelo (por defecto 1)"
+    )
+    parser.add_argument(
+        "--speedup",
+        nargs="+",
+        type=int,
+        metavar="W",
+        help="Mide la aceleracion del motor hda con cada numero de procesos W en lugar del benchmark",
+    )
+    parser.add_argument(
+        "--baseline",
+        "-b",
+        type=str,
+        help="Referencia JSON guardada con --save (por defecto los ficheros .stat de los mapas)",
+    )
+    parser.add_argument(
+        "--save", "-s", type=str, help="Guarda los resultados como nueva referencia JSON"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    maps = args.maps or sorted(glob.glob(BENCHMARK_MAPS))
+    modes = args.modes or heuristic_modes(maps)
+
+    if args.speedup:
+        for entry in speedup_report(maps, modes, args.speedup, args.timeout):
+            name = f"{entry['map']} modo {entry['mode']} procesos {entry['workers']}"
+            if entry["status"] != "ok":
+                print(f"{name}: {entry['status']}")
+                continue
+            print(
+                f"{name}: tiempo={entry['time']:.3f}s expandidos={entry['expanded']} coste={entry['cost']} aceleracion={entry['speedup']:.2f}x"
+            )
+        return
+
+    baseline = load_baseline(args.baseline, maps)
+    results = run_benchmark(
+        maps, modes, args.repeat, args.engine, args.timeout, args.workers
+    )
+
+    # Muestra cada resultado junto a su referencia y las regresiones encontradas
+    total_regressions = 0
+    for result in results:
+        reference = baseline.get(f"{result['map']}:{result['mode']}")
+        name = f"{result['map']} modo {result['mode']}"
+        if result["status"] != "ok":
+            print(f"{name}: {result['status']}")
+            continue
+        line = f"{name}: tiempo={result['time']:.3f}s expandidos={result['expanded']} memoria={result['peak_memory']} coste={result['cost']}"
+        if reference is None:
+            print(line, "(sin referencia)")
+            continue
+        regressions = compare(result, reference)
+        total_regressions += len(regressions)
+        if regressions:
+            print(line, "\033[91mREGRESION:", ", ".join(regressions), "\033[0m")
+        else:
+            print(line, "\033[92mOK\033[0m")
+
+    print(f"REGRESIONES -> {total_regressions}")
+    if args.save:
+        with open(args.save, "w") as archivo:
+            json.dump([r for r in results if r["status"] == "ok"], archivo, indent=2)
+
+    sys.exit(1 if total_regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+from ASTARBenchmark import *
+from Generator.Generator import (
+    generate_map,
+    write_map,
+    GENERATOR_SEED,
+    WALL_DENSITY,
+    WEIGHTED_DENSITY,
+)
+
+try:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+except ImportError:  # matplotlib solo es necesario para dibujar las graficas (--plot)
+    plt = None
+
+SCALING_PATH = "./ASTAR-scaling/"  # Directorio de los mapas generados
+SCALING_SIZES = [10, 20, 40, 80]  # Lado de los mapas (cuadrados)
+SCALING_PATIENTS = [2, 4, 6]  # Pacientes de cada mapa (uno de cada tres es Contagioso)
+SCALING_MODES = [3, 5, 7]
+SCALING_TIMEOUT = 60
+SCALING_OUTPUT = SCALING_PATH + "scaling.csv"
+# Metricas que se dibujan: campo del resultado y etiqueta del eje
+SCALING_METRICS = {
+    "time": "Tiempo de busqueda (s)",
+    "build_time": "Tiempo de preparacion (s)",
+    "expanded": "Nodos expandidos",
+    "peak_memory": "Pico de memoria (bytes)",
+}
+
+
+def generate_grid(
+    sizes: list,
+    patients: list,
+    walls: float = WALL_DENSITY,
+    weighted: float = WEIGHTED_DENSITY,
+    seed: int = GENERATOR_SEED,
+    path: str = SCALING_PATH,
+) -> list:
+    """
+    Genera un mapa por cada combinacion tamaño x pacientes y devuelve sus parametros. Todos usan la
+    misma semilla, por lo que la rejilla es reproducible
+    """
+    os.makedirs(path, exist_ok=True)
+    grid = []
+    for size in sizes:
+        for count in patients:
+            patientsC = count // 3
+            file_name = os.path.join(path, f"scaling-{size}x{size}-p{count}-s{seed}.csv")
+            write_map(
+                generate_map(
+                    size,
+                    size,
+                    count - patientsC,
+                    patientsC,
+                    walls,
+                    weighted,
+                    seed=seed,
+                ),
+                file_name,
+            )
+            grid.append({"file": file_name, "size": size, "patients": count})
+    return grid
+
+
+def run_scaling(
+    grid: list,
+    modes: list,
+    repeat: int = 1,
+    engine: str = ENGINE,
+    timeout: float = SCALING_TIMEOUT,
+    workers: int = 1,
+) -> list:
+    """
+    Ejecuta el benchmark (tiempo de busqueda y de preparacion del mapa, expansiones y pico de memoria) de
+    cada mapa de la rejilla con cada modo y añade a cada resultado el tamaño y los pacientes del mapa. Sin
+    cache de mapas ni tablas de patrones guardadas, para que la preparacion se mida siempre completa
+    """
+    results = run_benchmark(
+        [entry["file"] for entry in grid],
+        modes,
+        repeat,
+        engine,
+        timeout,
+        workers,
+        cache_path=None,
+        pdb_path=None,
+    )
+    parameters = {os.path.basename(entry["file"]): entry for entry in grid}
+    for result in results:
+        entry = parameters[result["map"]]
+        result.update({"size": entry["size"], "patients": entry["patients"]})
+    return results
+
+
+def plot_scaling(results: list, output_file: str) -> None:
+    """
+    Dibuja cada metrica frente al tamaño del mapa (con el menor numero de pacientes) y frente a los
+    pacientes (con el mayor tamaño), una linea por modo. Las ejecuciones sin resultado no se dibujan
+    """
+    if plt is None:
+        raise ImportError("Las graficas de ASTARScaling necesitan tener matplotlib instalado")
+    results = [result for result in results if result["status"] == "ok"]
+    sizes = sorted({result["size"] for result in results})
+    patients = sorted({result["patients"] for result in results})
+    modes = sorted({result["mode"] for result in results})
+    axes_x = [
+        ("size", "Lado del mapa", "patients", patients[:1]),
+        ("patients", "Pacientes", "size", sizes[-1:]),
+    ]
+
+    figure, axes = plt.subplots(
+        len(axes_x), len(SCALING_METRICS), figsize=(5 * len(SCALING_METRICS), 8)
+    )
+    for row, (x_field, x_label, fixed_field, fixed) in enumerate(axes_x):
+        for column, (metric, label) in enumerate(SCALING_METRICS.items()):
+            axis = axes[row][column]
+            for mode in modes:
+                points = sorted(
+                    (result[x_field], result[metric])
+                    for result in results
+                    if result["mode"] == mode and result[fixed_field] in fixed
+                )
+                if points:
+                    axis.plot(*zip(*points), marker="o", label=f"modo {mode}")
+            axis.set_xlabel(f"{x_label} ({fixed_field} = {fixed[0] if fixed else '-'})")
+            axis.set_ylabel(label)
+            axis.set_yscale("log")
+            axis.legend()
+    figure.tight_layout()
+    figure.savefig(output_file)
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(
+        description="Mide como escala ASTARTraslados con el tamaño del mapa y el numero de pacientes"
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=SCALING_SIZES,
+        help=f"Lados de los mapas generados (por defecto {SCALING_SIZES})",
+    )
+    parser.add_argument(
+        "--patients",
+        nargs="+",
+        type=int,
+        default=SCALING_PATIENTS,
+        help=f"Pacientes de los mapas generados (por defecto {SCALING_PATIENTS})",
+    )
+    parser.add_argument(
+        "--modes",
+        "-m",
+        nargs="+",
+        type=int,
+        default=SCALING_MODES,
+        help=f"Modos de heuristica (por defecto {SCALING_MODES})",
+    )
+    parser.add_argument(
+        "--walls",
+        type=float,
+        default=WALL_DENSITY,
+        help=f"Fraccion de muros (por defecto {WALL_DENSITY})",
+    )
+    parser.add_argument(
+        "--weighted",
+        type=float,
+        default=WEIGHTED_DENSITY,
+        help=f"Fraccion de casillas de coste 2 (por defecto {WEIGHTED_DENSITY})",
+    )
+    parser.add_argument(
+        "--seed", "-s", type=int, default=GENERATOR_SEED, help="Semilla de los mapas (por defecto 0)"
+    )
+    parser.add_argument(
+        "--repeat",
+        "-n",
+        type=int,
+        default=1,
+        help="Repeticiones por combinacion (por defecto 1)",
+    )
+    parser.add_argument(
+        "--engine",
+        "-e",
+        type=str,
+        default=ENGINE,
+        choices=ENGINES,
+        help="Motor de busqueda (por defecto astar)",
+    )
+    parser.add_argument(
+        "--timeout",
+        "-t",
+        type=float,
+        default=SCALING_TIMEOUT,
+        help=f"Segundos maximos por ejecucion (por defecto {SCALING_TIMEOUT})",
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1, help="Procesos en paralelo (por defecto 1)"
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        type=str,
+        default=SCALING_OUTPUT,
+        help=f"Tabla de resultados, .csv o .json (por defecto {SCALING_OUTPUT})",
+    )
+    parser.add_argument(
+        "--plot", type=str, help="Guarda las graficas en este fichero (necesita matplotlib)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    if args.plot and plt is None:
+        # Falla antes de ejecutar la rejilla, que puede tardar minutos
+        plot_scaling([], args.plot)
+    grid = generate_grid(args.sizes, args.patients, args.walls, args.weighted, args.seed)
+    results = run_scaling(
+        grid, args.modes, args.repeat, args.engine, args.timeout, args.workers
+    )
+
+    for result in results:
+        name = f"{result['size']}x{result['size']} pacientes {result['patients']} modo {result['mode']}"
+        if result["status"] != "ok":
+            print(f"{name}: {result['status']}")
+            continue
+        print(
+            f"{name}: tiempo={result['time']:.3f}s preparacion={result['build_time']:.3f}s expandidos={result['expanded']} memoria={result['peak_memory']} coste={result['cost']}"
+        )
+
+    export_table(results, args.output)
+    if args.plot:
+        plot_scaling(results, args.plot)
+
+
+if __name__ == "__main__":
+    main()
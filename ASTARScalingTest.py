@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+# Los modulos del proyecto se importan desde la raiz del repositorio, no desde el directorio del test
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path[0] = ROOT_PATH
+
+from ASTARScaling import *
+
+# Rejilla minima para la prueba: un mapa pequeño y un modo rapido
+TEST_ARGS = ["--sizes", "10", "--patients", "2", "--modes", "7", "--output", "scaling.csv"]
+
+
+def print_colored(message, color):
+    colors = {
+        "reset": "\033[0m",
+        "green": "\033[32m",
+        "red": "\033[31m",
+    }
+    print(f"{colors[color]}{message}{colors['reset']}")
+
+
+def run_test(test_function, test_name):
+    try:
+        test_function()
+        print_colored(f"{test_name} passed", "green")
+    except AssertionError:
+        print_colored(f"{test_name} failed", "red")
+
+
+def run_main(args: list, directory: str) -> None:
+    """
+    Ejecuta ASTARScaling desde el directorio indicado con los argumentos indicados y vuelve despues al
+    directorio de trabajo original
+    """
+    working_directory, argv = os.getcwd(), sys.argv
+    sys.argv = ["ASTARScaling.py"] + args
+    os.chdir(directory)
+    try:
+        main()
+    finally:
+        os.chdir(working_directory)
+        sys.argv = argv
+
+
+def test_plot():
+    # Con matplotlib --plot guarda las graficas; sin el falla antes de ejecutar la rejilla
+    with tempfile.TemporaryDirectory() as directory:
+        if plt is None:
+            try:
+                run_main(TEST_ARGS + ["--plot", "scaling.png"], directory)
+            except ImportError:
+                assert not os.path.exists(os.path.join(directory, "scaling.csv"))
+                return
+            assert False
+        run_main(TEST_ARGS + ["--plot", "scaling.png"], directory)
+        assert os.path.getsize(os.path.join(directory, "scaling.csv")) > 0
+        assert os.path.getsize(os.path.join(directory, "scaling.png")) > 0
+
+
+def test_working_directory():
+    # La prueba vuelve al directorio de trabajo original aunque el temporal ya no exista
+    working_directory = os.getcwd()
+    test_plot()
+    assert os.getcwd() == working_directory
+
+
+if __name__ == "__main__":
+    run_test(test_plot, "Test graficas de escalado")
+    run_test(test_working_directory, "Test directorio de trabajo")
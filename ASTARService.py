@@ -0,0 +1,234 @@
+from ASTARBatch import *
+from collections import OrderedDict
+import asyncio
+import hashlib
+import socket
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_MAPS = 8  # Mapas preparados que conserva cada proceso trabajador
+SERVICE_TIMEOUT = 60  # Segundos maximos por peticion
+SERVICE_LIMIT = 1 << 24  # Tamaño maximo de una peticion en bytes (el mapa viaja dentro)
+
+# Mapas preparados del proceso trabajador, indexados por (hash del CSV, modo, distancias)
+warm_maps = OrderedDict()
+
+
+def warm_map(contents: str, mode: int, distances: str, max_maps: int) -> Map:
+    """
+    Devuelve el mapa ya preparado (matriz, campos de distancia, escalas, tablas de patrones y cache de
+    heuristica) o lo construye en memoria desde el contenido del CSV, desalojando el usado hace mas
+    tiempo si se supera max_maps. Los mapas recibidos no se escriben en disco
+    """
+    map_key = (hashlib.sha1(contents.encode()).hexdigest(), mode, distances)
+    map = warm_maps.get(map_key)
+    if map is not None:
+        warm_maps.move_to_end(map_key)
+        return map
+    map = Map.from_string(contents, mode, distances)
+    warm_maps[map_key] = map
+    if len(warm_maps) > max_maps:
+        warm_maps.popitem(last=False)
+    return map
+
+
+def solve_request(
+    request: dict,
+    max_maps: int = SERVICE_MAPS,
+    timeout: float = SERVICE_TIMEOUT,
+) -> dict:
+    """
+    Resuelve una peticion en el proceso trabajador. La peticion trae el contenido del CSV en "map" y,
+    opcionalmente, "mode", "engine", "distances" y "workers" (procesos del motor hda). La respuesta
+    contiene los datos del .stat de esta peticion, el tiempo de preparacion del mapa y el plan en el
+    formato del .output
+    """
+    response = {"Estado": "ok"}
+    signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        mode = int(request.get("mode", 0))
+        distances = request.get("distances", DISTANCES)
+        engine = request.get("engine", ENGINE)
+        if engine not in ENGINES:
+            raise ValueError(f"motor de busqueda desconocido '{engine}'")
+
+        inicio_tiempo = time.time()
+        map = warm_map(request["map"], mode, distances, max_maps)
+        response["Tiempo de preparacion"] = time.time() - inicio_tiempo
+
+        astar_traslados = ASTARTraslados(None, map=map)
+        astar_traslados.engine = engine
+        if request.get("workers"):
+            astar_traslados.workers = int(request["workers"])
+
+        inicio_tiempo = time.time()
+        resultado = astar_traslados.search()
+        total_time = time.time() - inicio_tiempo
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+        if not resultado:
+            response["Estado"] = "sin solucion"
+            return response
+        rescale(resultado, astar_traslados.map.heuristic_escale)
+        response.update(
+            astar_traslados.info(
+                total_time, resultado[-1].g, len(resultado), astar_traslados.expanded
+            )
+        )
+        response["Plan"] = astar_traslados.solution_lines(resultado)
+    except JobTimeout:
+        response["Estado"] = "timeout"
+    except KeyError as e:
+        response["Estado"] = f"error: falta el campo {e}"
+    except Exception as e:
+        response["Estado"] = f"error: {e}"
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+    return response
+
+
+class SolverService:
+    """
+    Servicio local de planificacion. Cada conexion envia peticiones JSON, una por linea, y recibe una
+    respuesta JSON por linea en el mismo orden. El bucle de asyncio solo lee y escribe; las busquedas se
+    reparten entre un grupo de procesos que conservan sus mapas preparados entre peticiones, por lo que
+    las conexiones simultaneas se atienden en paralelo sin pagar el arranque de Python ni la carga del mapa
+    """
+
+    def __init__(
+        self,
+        workers: int = None,
+        max_maps: int = SERVICE_MAPS,
+        timeout: float = SERVICE_TIMEOUT,
+    ) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+        self.max_maps = max_maps
+        self.timeout = timeout
+
+    async def handle(self, reader, writer) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # La linea supera SERVICE_LIMIT: no se puede seguir leyendo la conexion
+                    writer.write(b'{"Estado": "error: peticion demasiado grande"}\n')
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"Estado": "error: peticion no valida"}
+                else:
+                    response = await loop.run_in_executor(
+                        self.executor,
+                        solve_request,
+                        request,
+                        self.max_maps,
+                        self.timeout,
+                    )
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(
+        self, host: str = SERVICE_HOST, port: int = SERVICE_PORT, socket_path: str = None
+    ) -> None:
+        """
+        Escucha en el socket Unix socket_path o, si no se indica, en host:port
+        """
+        if socket_path:
+            server = await asyncio.start_unix_server(
+                self.handle, socket_path, limit=SERVICE_LIMIT
+            )
+        else:
+            server = await asyncio.start_server(
+                self.handle, host, port, limit=SERVICE_LIMIT
+            )
+        async with server:
+            await server.serve_forever()
+
+    def close(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+
+
+def request_plan(
+    map_contents: str,
+    mode: int = 0,
+    engine: str = ENGINE,
+    host: str = SERVICE_HOST,
+    port: int = SERVICE_PORT,
+    socket_path: str = None,
+    **options,
+) -> dict:
+    """
+    Cliente del servicio: envia una peticion y devuelve la respuesta
+    """
+    if socket_path:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    request = {"map": map_contents, "mode": mode, "engine": engine} | options
+    with connection, connection.makefile("rwb") as stream:
+        stream.write(json.dumps(request).encode() + b"\n")
+        stream.flush()
+        return json.loads(stream.readline())
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(
+        description="Servicio local que resuelve peticiones de ASTARTraslados con los mapas ya preparados"
+    )
+    parser.add_argument(
+        "--socket", "-s", type=str, help="Socket Unix en el que escuchar (en lugar de TCP)"
+    )
+    parser.add_argument(
+        "--host", type=str, default=SERVICE_HOST, help=f"Direccion TCP (por defecto {SERVICE_HOST})"
+    )
+    parser.add_argument(
+        "--port", type=int, default=SERVICE_PORT, help=f"Puerto TCP (por defecto {SERVICE_PORT})"
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help="Procesos de busqueda (por defecto uno por nucleo)",
+    )
+    parser.add_argument(
+        "--maps",
+        type=int,
+        default=SERVICE_MAPS,
+        help=f"Mapas preparados que conserva cada proceso (por defecto {SERVICE_MAPS})",
+    )
+    parser.add_argument(
+        "--timeout",
+        "-t",
+        type=float,
+        default=SERVICE_TIMEOUT,
+        help=f"Segundos maximos por peticion (por defecto {SERVICE_TIMEOUT})",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    service = SolverService(args.workers, args.maps, args.timeout)
+    address = args.socket or f"{args.host}:{args.port}"
+    print(f"ESCUCHANDO -> {address}")
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
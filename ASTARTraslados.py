@@ -1,16 +1,39 @@
-from queue import PriorityQueue
 from Map.Map import *
-from State.State import State, Ambulance
+from State.State import State, Ambulance, MAX_ENERGY
+from Profiler.Profiler import Profiler
+from Trace.Trace import SearchTrace, TRACE_SAMPLE
+from Parallel.Parallel import hda_search, HDA_WORKERS
 import os
 import time
 import sys
 import argparse
-import bisect
+from array import array
+from collections import deque
+import heapq
+import itertools
+import json
+import math
 
 MEDIUM3_OPTIMAL = 62
 MEDIUM2_OPTIMAL = 47
 MEDIUM1_OPTIMAL = 33
 OUTPUT_PATH = "./ASTAR-test/"
+ENGINE = "astar"  # Motor de busqueda: "astar", "consistent", "ara" (ARA*), "beam", "focal", "macro", "hda" (HDA*), "ida" (IDA*) o "sma" (SMA*)
+ENGINES = ["astar", "consistent", "ara", "beam", "focal", "macro", "hda", "ida", "sma"]
+NODE_BUDGET = 100000  # Nodos maximos en memoria para SMA* y la tabla de transposiciones de IDA*
+ARA_EPSILON = 3.0  # Factor de inflado inicial de la heuristica en ARA*
+ARA_EPSILON_STEP = 0.5  # Reduccion de epsilon tras cada solucion de ARA*
+BEAM_WIDTH = 100  # Nodos que conserva cada capa de la busqueda en haz
+# Capas cuyos estados recuerda la busqueda en haz para descartar duplicados, por cada casilla de recarga
+# (parking y R). Sin cambiar de pacientes solo se vuelve a un estado pasando por casillas de recarga, el
+# primer ciclo de un camino pasa como mucho una vez por cada una y entre dos recargas hay como mucho
+# MAX_ENERGY pasos. Con BEAM_LAYERS * recargas + 1 capas ningun camino del haz repite estados y la busqueda
+# siempre termina
+BEAM_LAYERS = MAX_ENERGY
+FOCAL_WEIGHT = 1.5  # Factor de suboptimalidad de la busqueda focal
+DOMINANCE = False  # Poda por dominancia de energia en los motores astar y consistent
+NO_PARENT = -1  # Indice del padre del nodo raiz en la arena de A*
+NO_ACTION = 0xFF  # Codigo de accion del nodo raiz en la arena de A*
 
 
 class Node:
@@ -21,24 +44,162 @@ class Node:
         self.state = state
         self.father = father
         self.pointers = []
+        self.closed = False
+
+
+class BoundedNode(Node):
+    def __init__(self, state: State, father: "BoundedNode" = None):
+        """
+        Nodo de SMA*: guarda su profundidad, los hijos que siguen en memoria y el mejor f olvidado
+        """
+        super().__init__(state, father)
+        self.depth = father.depth + 1 if father else 0
+        self.children = 0
+        self.forgotten = math.inf
+        self.in_open = False
+        self.version = 0
 
 
 class ASTARTraslados:
-    def __init__(self, input_file: str, mode: int = 0):
-        self.map = Map(input_file, mode)
+    def __init__(
+        self,
+        input_file: str,
+        mode: int = 0,
+        distances: str = DISTANCES,
+        cache_size: int = HEURISTIC_CACHE_SIZE,
+        distp: str = DISTP,
+        cache_path: str = MAP_CACHE_PATH,
+        map: Map = None,
+    ):
+        # Se puede reutilizar un mapa ya preparado (ver ASTARService y Solver), en cuyo caso se ignoran
+        # el resto de argumentos
+        self.map = (
+            map
+            if map is not None
+            else Map(input_file, mode, distances, cache_size, distp, cache_path)
+        )
+        # Argumentos del mapa, para que los procesos de HDA* construyan el suyo
+        self.map_args = self.map.init_args
         self.initial_state = self.map.getInitialState()
         self.final_state = self.map.getFinalState()
-        self.map.copyMap(self.initial_state)
         self.verbose_flag = 0
         self.check_flag = 0
         self.check_ad = 0
         self.expanded = 0
+        self.peak_nodes = 0
+        # Contadores de la cache de heuristica del mapa al empezar la ultima busqueda. El mapa puede venir
+        # ya usado (ver ASTARService y Solver), asi que se informa de la diferencia
+        self.cache_start = dict(self.map.cache_stats)
+        self.node_budget = NODE_BUDGET
+        # Parametros de ARA*, cota de la ultima solucion y funcion a la que se entrega cada solucion
+        self.epsilon = ARA_EPSILON
+        self.epsilon_step = ARA_EPSILON_STEP
+        self.bound = 1
+        self.on_solution = None
+        # Parametros de las busquedas en haz y focal y mayor frontera que han mantenido
+        self.beam_width = BEAM_WIDTH
+        self.focal_weight = FOCAL_WEIGHT
+        self.peak_frontier = 0
+        # Poda de estados dominados (misma configuracion con g mayor o igual y menos energia) en A*
+        self.dominance = DOMINANCE
+        # Procesos de HDA* y expansiones de cada uno en la ultima busqueda
+        self.workers = HDA_WORKERS
+        self.worker_expanded = []
+        # Perfilador del modo --profile con los tiempos y contadores de la busqueda (None si esta desactivado)
+        self.profiler = None
+        # Flujo de eventos del modo --trace (None si esta desactivado)
+        self.trace = None
+        # Diccionario de motores de busqueda
+        self.engine = ENGINE
+        self.search_engines = {
+            "astar": self.search_path,
+            "consistent": self.search_consistent,
+            "ara": self.search_ara,
+            "beam": self.search_beam,
+            "focal": self.search_focal,
+            "macro": self.search_macro,
+            "hda": self.search_hda,
+            "ida": self.search_ida,
+            "sma": self.search_sma,
+        }
+
+    def enable_profile(self) -> None:
+        """
+        Activa el perfilado: mide por separado la generacion de sucesores, cada funcion heuristica y la
+        reconstruccion del camino. El tiempo de abiertos/cerrados es el resto del tiempo de busqueda
+        """
+        self.profiler = Profiler()
+        self.map.enable_profile(self.profiler)
+        # search_macro no usa Map.expand: sus sucesores se miden y cuentan como los del resto de motores
+        self.macro_successors = self.profiler.timed(
+            "expand", self.macro_successors, "nodos generados"
+        )
+        self.build_path = self.profiler.timed("reconstruccion del camino", self.build_path)
+        self.replay_path = self.profiler.timed("reconstruccion del camino", self.replay_path)
+
+    def profile_report(self, total_time: float) -> dict:
+        """
+        Desglose del tiempo de busqueda por fases y contadores de la ultima busqueda
+        """
+        times = self.profiler.times
+        report = {
+            "busqueda": total_time,
+            "generacion de sucesores": times["expand"] - times["heuristica"],
+            "heuristica": times["heuristica"],
+            "abiertos/cerrados": total_time
+            - times["expand"]
+            - times["reconstruccion del camino"],
+            "reconstruccion del camino": times["reconstruccion del camino"],
+        }
+        # Tiempo inclusivo de cada funcion heuristica y metrica de distancia
+        for phase, seconds in times.items():
+            if phase not in report and phase != "expand":
+                report[phase] = seconds
+        return {"tiempos": report, "contadores": dict(self.profiler.counters)}
+
+    def search(self) -> list:
+        """
+        Ejecuta el motor de busqueda seleccionado y devuelve el camino solucion (vacio si no hay)
+        """
+        self.cache_start = dict(self.map.cache_stats)
+        if self.profiler:
+            # El desglose es el de esta busqueda aunque el mapa y el buscador se reutilicen
+            self.profiler.reset()
+        try:
+            return self.search_engines[self.engine]()
+        finally:
+            if self.trace:
+                self.trace.close()
 
     def build_path(self, current_node: Node):
         camino = [current_node.state]
         while current_node.father:
             current_node = current_node.father
-            camino.insert(0, current_node.state)
+            camino.append(current_node.state)
+        camino.reverse()
+        return camino
+
+    def replay_path(self, parents: array, actions: bytearray, index: int) -> list:
+        """
+        Reconstruye el camino hasta el nodo index de la arena: recoge las acciones siguiendo los indices
+        de los padres y las reproduce desde el estado inicial, en tiempo lineal
+        """
+        path_actions = bytearray()
+        while parents[index] != NO_PARENT:
+            path_actions.append(actions[index])
+            index = parents[index]
+        path_actions.reverse()
+        return self.replay_actions(path_actions)
+
+    def replay_actions(self, path_actions: bytearray) -> list:
+        """
+        Aplica los codigos de accion desde el estado inicial y devuelve los estados recorridos
+        """
+        state = self.initial_state
+        camino = [state]
+        for action in path_actions:
+            state = self.map.step(state, action)
+            camino.append(state)
         return camino
 
     def print_highlighted_positions(self, matrix, highlighted_positions):
@@ -55,152 +216,824 @@ class ASTARTraslados:
                     print(value, end=" ")
             print()
 
-    def search_path(self):
+    def search_consistent(self) -> list:
+        """
+        A* para heuristicas consistentes: los nodos cerrados son definitivos, nunca se reabren
+        """
+        return self.search_path(reopen=False)
+
+    def search_path(self, reopen: bool = None):
+        """
+        A* sobre una arena de nodos: cada nodo es un indice en columnas paralelas (clave del estado, g, h,
+        f, indice del padre y codigo de la accion que lo genero). Solo las claves guardan el estado; el
+        State completo se reconstruye al sacarlo de abiertos y el camino se rehace reproduciendo las
+        acciones desde el estado inicial.
+
+        Si reopen es False los duplicados de nodos cerrados se descartan sin compararlos, lo que solo es
+        correcto con heuristicas consistentes. Por defecto se reabren salvo si Map.consistent
+        """
+        if reopen is None:
+            reopen = not self.map.consistent
         self.expanded = 0
-        # Create the initial Node
-        initial_node = Node(self.initial_state)
+        map = self.map
+        actions = map.actions
 
-        # Initialize data structures
-        open_set = []
-        open_set.append(initial_node)
+        # Columnas de la arena
+        keys = [self.initial_state.key()]
+        g_values = array("d", [self.initial_state.g])
+        h_values = array("d", [self.initial_state.h])
+        f_values = array("d", [self.initial_state.f])
+        parents = array("l", [NO_PARENT])
+        node_actions = bytearray([NO_ACTION])
+        closed = bytearray(1)
+        # Indice de cada estado dentro de la arena por su clave canonica: pertenencia en O(1)
+        index_of = {keys[0]: 0}
 
-        closed_set = []
+        # open_set es un monticulo de (f, orden de insercion, indice). El contador desempata por orden de llegada
+        counter = itertools.count()
+        open_set = [(f_values[0], next(counter), 0)]
+        open_size = 1
         success = False
+        # Contadores de la busqueda
+        duplicates = stale = improved_open = reopened = relinked = 0
+        trace = self.trace
+        # Frente de Pareto (g, energia) por configuracion del estado sin energia, para la poda por dominancia
+        dominance = self.dominance
+        pareto = {keys[0][:1] + keys[0][2:]: [0]}
+        dominated = 0
 
-        path = []
         # Main loop
-        while not len(open_set) == 0 or success:
-            # Remove the first node from open_set and add it to closed_set
-            current_node = open_set.pop(0)
-
-            if self.check_flag == 1:
-                self.check_consistency(current_node)
-            if self.check_ad == 1:
-                self.check_admissibility(current_node)
-            # Verbose consistent
+        while open_set:
+            f, _, current = heapq.heappop(open_set)
+
+            # Entrada obsoleta: el nodo ya se cerro o se mejoro despues de insertarla
+            if closed[current] or f != f_values[current]:
+                stale += 1
+                continue
+            closed[current] = 1
+            open_size -= 1
+
+            current_state = State.from_key(keys[current])
+            current_state.g = g_values[current]
+            current_state.h = h_values[current]
+            current_state.f = f
+            if self.check_flag == 1 or self.check_ad == 1:
+                father = parents[current]
+                father_state = None
+                if father != NO_PARENT:
+                    father_state = State.from_key(keys[father])
+                    father_state.h = h_values[father]
+                if self.check_flag == 1:
+                    self.check_consistency(current_state, father_state)
+                if self.check_ad == 1:
+                    self.check_admissibility(current_state, father_state)
             if self.verbose_flag == 1:
-                self.verbose(current_node, path)
-            # Expand node
-            closed_set.append(current_node)
-            if current_node.state.equal_goal(self.final_state):
+                self.verbose(self.replay_path(parents, node_actions, current))
+            if current_state.equal_goal(self.final_state):
                 success = True
                 break
 
             # Generate successors
-            successors = self.map.expand(current_node.state)
+            successors = map.expand(current_state)
             self.expanded += 1
+            if trace:
+                trace.record(self.expanded, current_state, open_size)
+            x, y = current_state.getPosition()
             for successor_state in successors:
-                # Create a node for each successor and create a pointer to the current node
-                successor_node = Node(successor_state, current_node)
-
-                current_node.pointers.append(successor_node)
-                found = False
-                # For each successor in open_set, redirect the pointer to current if it has a worse evaluation
-                for node in open_set:
-                    if node.state == successor_state:
-                        found = True
-                        if node.state.f > successor_state.f:
-                            open_set = sorted(open_set, key=lambda x: x.state.f)
-                            node.state.f = successor_state.f
-                            node.father = current_node
-                        break
-
-                # For each successor in closed_set, redirect the parent pointer to the current node and the pointers of its children to the successor
-                for node in closed_set:
-                    if node.state == successor_state:
-                        found = True
-                        if node.state.f > successor_state.f:
-                            node.state.f = successor_state.f
-                            open_set = sorted(open_set, key=lambda x: x.state.f)
-                            # Avoid generating cycles (should not happen if the heuristic is consistent)
-                            if current_node.father.state == successor_state:
-                                pass
-                            else:
-                                node.father = current_node
-                                for children in node.pointers:
-                                    children.father = successor_node
-                        break
-
-                # Inserta el sucesor en la posicion correcta para mantener abierta ordenada por el valor de evaluacion
-                if not found:
-                    bisect.insort(open_set, successor_node, key=lambda x: x.state.f)
+                successor_key = successor_state.key()
+                successor_f = successor_state.f
+                position = successor_state.getPosition()
+                action = actions[(position[0] - x, position[1] - y)]
+
+                node = index_of.get(successor_key)
+                if node is not None:
+                    duplicates += 1
+                    if (not reopen and closed[node]) or f_values[node] <= successor_f:
+                        continue
+                    # Mejor camino: se reenlaza el padre y se reinserta con la nueva f; la entrada antigua
+                    # queda obsoleta. Si estaba cerrado se reabre
+                    if closed[node]:
+                        reopened += 1
+                        closed[node] = 0
+                        open_size += 1
+                    else:
+                        improved_open += 1
+                    relinked += 1
+                    g_values[node] = successor_state.g
+                    f_values[node] = successor_f
+                    parents[node] = current
+                    node_actions[node] = action
+                    heapq.heappush(open_set, (successor_f, next(counter), node))
+                    continue
+
+                # Poda por dominancia: con la misma configuracion, menos g y mas energia nunca es peor
+                if dominance:
+                    front = pareto.setdefault(successor_key[:1] + successor_key[2:], [])
+                    successor_g, energy = successor_state.g, successor_key[1]
+                    if any(
+                        g_values[other] <= successor_g and keys[other][1] >= energy
+                        for other in front
+                    ):
+                        dominated += 1
+                        continue
+                    kept = []
+                    for other in front:
+                        if successor_g <= g_values[other] and energy >= keys[other][1]:
+                            # Un abierto dominado se descarta; un camino mejor a su clave creara un nodo nuevo
+                            if not closed[other]:
+                                closed[other] = 1
+                                open_size -= 1
+                                del index_of[keys[other]]
+                                dominated += 1
+                        else:
+                            kept.append(other)
+                    kept.append(len(keys))
+                    front[:] = kept
+
+                # Nuevo nodo al final de la arena
+                node = len(keys)
+                keys.append(successor_key)
+                g_values.append(successor_state.g)
+                h_values.append(successor_state.h)
+                f_values.append(successor_f)
+                parents.append(current)
+                node_actions.append(action)
+                closed.append(0)
+                index_of[successor_key] = node
+                open_size += 1
+                heapq.heappush(open_set, (successor_f, next(counter), node))
+
+        self.peak_nodes = len(keys)
+        if self.profiler:
+            self.profiler.counters.update(
+                {
+                    "duplicados": duplicates,
+                    "entradas obsoletas": stale,
+                    "mejoras en abiertos": improved_open,
+                    "mejoras en cerrados": reopened,
+                    "padres reenlazados": relinked,
+                    "podados por dominancia": dominated,
+                }
+            )
 
         # Build the solution if found
         if success:
-            solution = self.build_path(current_node)
-            return solution
+            return self.replay_path(parents, node_actions, current)
         else:
             return []
 
-    def verbose(self, current_node: Node, path: List):
+    def search_ara(self) -> list:
         """
-        Comprueba la consistencia de la heuristica mediante la formula h(n) <= c(n, m) + h(m)
+        ARA*: A* ponderado con prioridad g + epsilon * h que publica una primera solucion rapidamente y la
+        mejora reduciendo epsilon. Cada iteracion reutiliza los nodos de la anterior: solo vuelven a
+        abiertos los que quedaron abiertos y los inconsistentes (cerrados cuyo g mejoro). Tras cada
+        solucion calcula la cota de suboptimalidad, coste / min(g + h) de abiertos e inconsistentes, y
+        llama a on_solution con el camino, de modo que siempre hay un plan disponible
         """
-        # Calcula el nuevo camino
+        self.expanded = 0
+        self.bound = math.inf
+        if self.initial_state.equal_goal(self.final_state):
+            self.bound = 1
+            return [self.initial_state]
 
-        path = []
+        map = self.map
+        actions = map.actions
+        trace = self.trace
+        epsilon = max(self.epsilon, 1)
+
+        # Columnas de la arena, como en search_path
+        keys = [self.initial_state.key()]
+        g_values = array("d", [self.initial_state.g])
+        h_values = array("d", [self.initial_state.h])
+        parents = array("l", [NO_PARENT])
+        node_actions = bytearray([NO_ACTION])
+        closed = bytearray(1)
+        in_open = bytearray([1])
+        index_of = {keys[0]: 0}
+        # Nodos cerrados cuyo g ha mejorado: se expandiran en la siguiente iteracion
+        inconsistent = set()
+        goal, goal_g = NO_PARENT, math.inf
+
+        counter = itertools.count()
+        open_set = [(g_values[0] + epsilon * h_values[0], next(counter), 0)]
+        while True:
+            # Mejora el camino mientras algun nodo abierto pueda mejorar la solucion actual
+            while open_set:
+                priority, _, current = open_set[0]
+                if not in_open[current] or priority != g_values[current] + epsilon * h_values[current]:
+                    heapq.heappop(open_set)
+                    continue
+                if goal_g <= priority:
+                    break
+                heapq.heappop(open_set)
+                in_open[current] = 0
+                closed[current] = 1
+
+                current_state = State.from_key(keys[current])
+                current_state.g = g_values[current]
+                current_state.h = h_values[current]
+                current_state.f = current_state.g + current_state.h
+                if current_state.equal_goal(self.final_state):
+                    continue
+
+                successors = map.expand(current_state)
+                self.expanded += 1
+                if trace:
+                    trace.record(self.expanded, current_state, len(open_set))
+                x, y = current_state.getPosition()
+                for successor_state in successors:
+                    successor_key = successor_state.key()
+                    successor_g = successor_state.g
+                    position = successor_state.getPosition()
+                    action = actions[(position[0] - x, position[1] - y)]
+
+                    node = index_of.get(successor_key)
+                    if node is None:
+                        node = len(keys)
+                        keys.append(successor_key)
+                        g_values.append(successor_g)
+                        h_values.append(successor_state.h)
+                        parents.append(current)
+                        node_actions.append(action)
+                        closed.append(0)
+                        in_open.append(0)
+                        index_of[successor_key] = node
+                    elif g_values[node] <= successor_g:
+                        continue
+                    else:
+                        g_values[node] = successor_g
+                        parents[node] = current
+                        node_actions[node] = action
+
+                    if successor_state.equal_goal(self.final_state) and successor_g < goal_g:
+                        goal, goal_g = node, successor_g
+                    if closed[node]:
+                        inconsistent.add(node)
+                    else:
+                        in_open[node] = 1
+                        heapq.heappush(
+                            open_set,
+                            (successor_g + epsilon * h_values[node], next(counter), node),
+                        )
+
+            self.peak_nodes = len(keys)
+            if goal == NO_PARENT:
+                return []
 
-        for state in self.build_path(current_node):
-            path.append(state.getPosition())
+            # Cota: ningun nodo pendiente puede llevar a una solucion con coste menor que min(g + h)
+            pending = [i for i in range(len(keys)) if in_open[i]] + list(inconsistent)
+            lower = min((g_values[i] + h_values[i] for i in pending), default=math.inf)
+            bound = max(1, min(epsilon, goal_g / lower)) if lower > 0 else epsilon
+            if bound < self.bound:
+                self.bound = bound
+                if self.on_solution:
+                    self.on_solution(self.replay_path(parents, node_actions, goal))
+            if epsilon == 1 or bound == 1:
+                return self.replay_path(parents, node_actions, goal)
+
+            # Siguiente iteracion: menor epsilon, los inconsistentes vuelven a abiertos y se vacia cerrados
+            epsilon = max(1, epsilon - self.epsilon_step)
+            for node in inconsistent:
+                in_open[node] = 1
+            inconsistent.clear()
+            closed = bytearray(len(keys))
+            open_set = [
+                (g_values[i] + epsilon * h_values[i], next(counter), i)
+                for i in range(len(keys))
+                if in_open[i]
+            ]
+            heapq.heapify(open_set)
+
+    def search_beam(self) -> list:
+        """
+        Busqueda en haz: avanza por capas de profundidad y en cada capa solo conserva los beam_width
+        sucesores con menor f. La frontera queda acotada por el ancho del haz a cambio de perder la
+        optimalidad (y la completitud). Los nodos de ramas descartadas se liberan al no tener hijos en el haz.
+        Los duplicados se detectan contra los estados generados en las ultimas BEAM_LAYERS capas por cada
+        casilla de recarga, por lo que la memoria tambien queda acotada por el ancho del haz
+        """
+        self.expanded = 0
+        self.peak_frontier = 1
+        if self.initial_state.equal_goal(self.final_state):
+            return [self.initial_state]
+
+        trace = self.trace
+        # Mejor g de los estados de las ultimas capas y capa en la que se guardo: evita volver a ellos con
+        # mayor coste. history guarda las claves de cada capa para olvidarlas layers capas despues
+        layers = BEAM_LAYERS * (len(self.map.recharges) + 1) + 1
+        best_g = {self.initial_state.key(): (self.initial_state.g, 0)}
+        history = deque([(0, list(best_g))])
+        beam = [Node(self.initial_state)]
+        depth = 0
+        self.peak_nodes = 1
+        while beam:
+            depth += 1
+            layer = {}
+            goals = []
+            for node in beam:
+                successors = self.map.expand(node.state)
+                self.expanded += 1
+                if trace:
+                    trace.record(self.expanded, node.state, len(beam))
+                for successor_state in successors:
+                    key = successor_state.key()
+                    if best_g.get(key, (math.inf,))[0] <= successor_state.g:
+                        continue
+                    other = layer.get(key)
+                    if other is not None and other.state.g <= successor_state.g:
+                        continue
+                    child = Node(successor_state, node)
+                    if successor_state.equal_goal(self.final_state):
+                        goals.append(child)
+                    else:
+                        layer[key] = child
+
+            self.peak_frontier = max(self.peak_frontier, len(layer))
+            self.peak_nodes = max(self.peak_nodes, len(best_g) + len(layer))
+            if goals:
+                return self.build_path(min(goals, key=lambda node: node.state.g))
+            beam = heapq.nsmallest(
+                self.beam_width, layer.values(), key=lambda node: node.state.f
+            )
+
+            for key, node in layer.items():
+                best_g[key] = (node.state.g, depth)
+            history.append((depth, list(layer)))
+            if len(history) > layers:
+                old_depth, old_keys = history.popleft()
+                for key in old_keys:
+                    if best_g[key][1] == old_depth:
+                        del best_g[key]
+        return []
+
+    def search_focal(self) -> list:
+        """
+        Busqueda focal (A*epsilon): de los nodos abiertos con f <= focal_weight * f_min expande el de menor h,
+        es decir, el que parece mas cercano a la meta. Con una heuristica admisible el coste de la
+        solucion es como mucho focal_weight veces el optimo. Usa la misma arena de nodos que search_path y,
+        como ella, reabre los cerrados salvo si Map.consistent. Si f_min baja, los nodos de focal que
+        superan el nuevo umbral vuelven a pending al llegar a la cima de focal
+        """
+        self.expanded = 0
+        map = self.map
+        reopen = not map.consistent
+        actions = map.actions
+        trace = self.trace
+        weight = max(self.focal_weight, 1)
+
+        keys = [self.initial_state.key()]
+        g_values = array("d", [self.initial_state.g])
+        h_values = array("d", [self.initial_state.h])
+        f_values = array("d", [self.initial_state.f])
+        parents = array("l", [NO_PARENT])
+        node_actions = bytearray([NO_ACTION])
+        closed = bytearray(1)
+        index_of = {keys[0]: 0}
+
+        # open_set ordena por f para conocer f_min; pending guarda, tambien por f, los abiertos que aun no
+        # han entrado en focal; focal ordena por h los abiertos con f <= weight * f_min
+        counter = itertools.count()
+        open_set = [(f_values[0], next(counter), 0)]
+        pending = list(open_set)
+        focal = []
+        open_size = self.peak_frontier = 1
+
+        while True:
+            while open_set and (
+                closed[open_set[0][2]] or open_set[0][0] != f_values[open_set[0][2]]
+            ):
+                heapq.heappop(open_set)
+            if not open_set:
+                break
+            threshold = weight * open_set[0][0]
+            while pending and pending[0][0] <= threshold:
+                f, entry, node = heapq.heappop(pending)
+                if not closed[node] and f == f_values[node]:
+                    heapq.heappush(focal, (h_values[node], f, entry, node))
+
+            _, f, entry, current = heapq.heappop(focal)
+            if closed[current] or f != f_values[current]:
+                continue
+            if f > threshold:
+                heapq.heappush(pending, (f, entry, current))
+                continue
+            closed[current] = 1
+            open_size -= 1
+
+            current_state = State.from_key(keys[current])
+            current_state.g = g_values[current]
+            current_state.h = h_values[current]
+            current_state.f = f
+            if current_state.equal_goal(self.final_state):
+                self.peak_nodes = len(keys)
+                return self.replay_path(parents, node_actions, current)
+
+            successors = map.expand(current_state)
+            self.expanded += 1
+            if trace:
+                trace.record(self.expanded, current_state, open_size)
+            x, y = current_state.getPosition()
+            for successor_state in successors:
+                successor_key = successor_state.key()
+                successor_f = successor_state.f
+                position = successor_state.getPosition()
+                action = actions[(position[0] - x, position[1] - y)]
+
+                node = index_of.get(successor_key)
+                if node is None:
+                    node = len(keys)
+                    keys.append(successor_key)
+                    g_values.append(successor_state.g)
+                    h_values.append(successor_state.h)
+                    f_values.append(successor_f)
+                    parents.append(current)
+                    node_actions.append(action)
+                    closed.append(0)
+                    index_of[successor_key] = node
+                    open_size += 1
+                elif f_values[node] <= successor_f or (closed[node] and not reopen):
+                    continue
+                else:
+                    if closed[node]:
+                        closed[node] = 0
+                        open_size += 1
+                    g_values[node] = successor_state.g
+                    f_values[node] = successor_f
+                    parents[node] = current
+                    node_actions[node] = action
+
+                entry = next(counter)
+                heapq.heappush(open_set, (successor_f, entry, node))
+                heapq.heappush(pending, (successor_f, entry, node))
+            self.peak_frontier = max(self.peak_frontier, open_size)
+
+        self.peak_nodes = len(keys)
+        return []
+
+    def macro_targets(self, state: State) -> list:
+        """
+        Paradas utiles desde state: pacientes que caben en la ambulancia (los Contagiosos solo cuando ya
+        no quedan No Contagiosos), los centros si hay pacientes de su tipo a bordo, el parking y los
+        puntos de recarga, por los que pasan los tramos demasiado largos para una sola carga
+        """
+        map = self.map
+        ambulance = state.ambulance
+        targets = []
+        if ambulance.PN < ambulance.capacityN or (
+            ambulance.PCN + ambulance.PCC < ambulance.capacityC and ambulance.PCC == 0
+        ):
+            targets += [
+                pos for pos in map.posN if not state.picked & map.patient_bits[pos]
+            ]
+        if (
+            state.currentN() == len(map.posN)
+            and ambulance.PCN + ambulance.PCC < ambulance.capacityC
+            and ambulance.PCN == 0
+        ):
+            targets += [
+                pos for pos in map.posC if not state.picked & map.patient_bits[pos]
+            ]
+        if ambulance.PN + ambulance.PCN > 0:
+            targets.append(map.posCN)
+        if ambulance.PCC > 0:
+            targets.append(map.posCC)
+        targets += [map.parking] + map.recharges
+        return [target for target in targets if target != ambulance.pos]
+
+    def macro_successors(self, state: State) -> list:
+        """
+        Sucesores de state en search_macro: el estado de llegada y las acciones del tramo hasta cada parada
+        alcanzable con la energia disponible
+        """
+        successors = []
+        for target in self.macro_targets(state):
+            result = self.map.drive(state, target)
+            if result is not None:
+                successors.append(result)
+        return successors
+
+    def search_macro(self) -> list:
+        """
+        A* sobre macroacciones: cada sucesor es conducir por un camino de coste minimo hasta una parada
+        (paciente, CC, CN o parking), simulado casilla a casilla con Map.drive para respetar la energia y
+        los operadores. La profundidad pasa de la longitud del camino al numero de paradas. Como los caminos
+        entre paradas son fijos la solucion puede no ser optima. El plan se expande a casillas al final
+        """
+        self.expanded = 0
+        trace = self.trace
+        # Nodos de la busqueda: estado de llegada, indice del padre y acciones del tramo recorrido
+        states = [self.initial_state]
+        parents = [NO_PARENT]
+        segments = [b""]
+        best_g = {self.initial_state.key(): self.initial_state.g}
+
+        counter = itertools.count()
+        open_set = [(self.initial_state.f, next(counter), 0)]
+        while open_set:
+            f, _, current = heapq.heappop(open_set)
+            state = states[current]
+            if best_g[state.key()] < state.g:
+                continue
+            if state.equal_goal(self.final_state):
+                self.peak_nodes = len(states)
+                path_actions = bytearray()
+                while current != NO_PARENT:
+                    path_actions[:0] = segments[current]
+                    current = parents[current]
+                return self.replay_actions(path_actions)
+
+            self.expanded += 1
+            if trace:
+                trace.record(self.expanded, state, len(open_set))
+            for successor_state, actions in self.macro_successors(state):
+                key = successor_state.key()
+                if best_g.get(key, math.inf) <= successor_state.g:
+                    continue
+                best_g[key] = successor_state.g
+                states.append(successor_state)
+                parents.append(current)
+                segments.append(actions)
+                heapq.heappush(
+                    open_set, (successor_state.f, next(counter), len(states) - 1)
+                )
+
+        self.peak_nodes = len(states)
+        return []
+
+    def search_hda(self) -> list:
+        """
+        HDA*: A* repartido por el hash de la clave de cada estado entre self.workers procesos (ver
+        Parallel.hda_search). El camino se reconstruye reproduciendo las acciones desde el estado inicial
+        """
+        path_actions, self.worker_expanded, stored, _ = hda_search(
+            self.map_args, self.initial_state, self.workers
+        )
+        self.expanded = sum(self.worker_expanded)
+        self.peak_nodes = sum(stored)
+        if path_actions is None:
+            return []
+        return self.replay_actions(path_actions)
+
+    def search_ida(self) -> list:
+        """
+        IDA*: busqueda en profundidad limitada por f que aumenta el umbral al menor f que lo supero.
+        Solo mantiene en memoria el camino actual y una tabla de transposiciones acotada por node_budget
+        que se conserva entre iteraciones. Para cada estado guarda el g con el que se visito en la
+        iteracion actual, que poda las visitas con un coste g mayor o igual, y una cota del coste hasta la
+        meta aprendida al terminar de explorar su subarbol (el menor f que supero el umbral, menos g), que
+        sustituye a h cuando es mayor. Con la cota aprendida cada iteracion salta los f ya descartados.
+        Al encontrar una meta se termina la iteracion podando por su coste, por lo que la solucion es
+        optima con una heuristica admisible
+        """
+        self.expanded = 0
+        self.peak_nodes = 0
+        trace = self.trace
+        if self.initial_state.equal_goal(self.final_state):
+            return [self.initial_state]
+
+        # Clave -> [g en la iteracion, iteracion, cota aprendida del coste hasta la meta]
+        table = {}
+        best, best_g = None, math.inf
+        iteration = 0
+        threshold = self.initial_state.h
+        while threshold < math.inf:
+            iteration += 1
+            next_threshold = math.inf
+            path = [self.initial_state]
+            on_path = {self.initial_state.key()}
+            # Cada nivel guarda sus sucesores pendientes, el menor f que supero el umbral en su subarbol y
+            # si ese valor es exacto (ningun sucesor se podo por estar repetido)
+            stack = [[iter(sorted(self.map.expand(self.initial_state), key=lambda x: x.f)), math.inf, True]]
+            self.expanded += 1
+            if trace:
+                trace.record(self.expanded, self.initial_state, 1)
+
+            while stack:
+                level = stack[-1]
+                state = next(level[0], None)
+                # Sin mas sucesores: retrocede y aprende la cota del estado
+                if state is None:
+                    stack.pop()
+                    node = path.pop()
+                    key = node.key()
+                    on_path.discard(key)
+                    entry = table.get(key)
+                    if level[2] and entry is not None:
+                        entry[2] = max(entry[2], level[1] - node.g)
+                    if stack:
+                        stack[-1][1] = min(stack[-1][1], level[1])
+                        stack[-1][2] = stack[-1][2] and level[2]
+                    continue
+
+                key = state.key()
+                entry = table.get(key)
+                f = state.g + max(state.h, entry[2]) if entry is not None else state.f
+                # Supera el umbral o no mejora la meta encontrada: candidato para la siguiente iteracion
+                if f > threshold or f >= best_g:
+                    level[1] = min(level[1], f)
+                    if f < best_g:
+                        next_threshold = min(next_threshold, f)
+                    continue
+
+                if key in on_path or (
+                    entry is not None and entry[1] == iteration and entry[0] <= state.g
+                ):
+                    level[2] = False
+                    continue
+                if entry is not None:
+                    entry[0], entry[1] = state.g, iteration
+                elif len(table) < self.node_budget:
+                    table[key] = [state.g, iteration, state.h]
+
+                if state.equal_goal(self.final_state):
+                    best, best_g = path + [state], state.g
+                    level[1] = min(level[1], state.g)
+                    continue
+
+                path.append(state)
+                on_path.add(key)
+                stack.append([iter(sorted(self.map.expand(state), key=lambda x: x.f)), math.inf, True])
+                self.expanded += 1
+                if trace:
+                    trace.record(self.expanded, state, len(path))
+                self.peak_nodes = max(self.peak_nodes, len(path) + len(table))
+
+            # Todos los nodos con f <= umbral se han explorado: ninguna solucion mejora la encontrada
+            if best is not None:
+                return best
+            threshold = next_threshold
+        return []
+
+    def search_sma(self) -> list:
+        """
+        SMA*: A* con un maximo de node_budget nodos en memoria. Cuando se llena olvida la hoja abierta
+        con peor f y guarda ese f en su padre, que vuelve a abiertos con ese valor para regenerar el
+        hijo olvidado mas adelante. Encuentra la solucion optima si su camino cabe en memoria
+        """
+        self.expanded = 0
+        trace = self.trace
+        counter = itertools.count()
+        root = BoundedNode(self.initial_state)
+        root.state.f = root.state.g + root.state.h
+        nodes = {root.state.key(): root}
+        # Monticulos de mejores (menor f, mas profundo) y peores (mayor f, menos profundo) nodos abiertos
+        best, worst = [], []
+
+        def push(node: BoundedNode) -> None:
+            node.in_open = True
+            node.version += 1
+            entry = next(counter)
+            heapq.heappush(best, (node.state.f, -node.depth, entry, node.version, node))
+            heapq.heappush(worst, (-node.state.f, node.depth, entry, node.version, node))
+
+        def forget_worst_leaf(current: BoundedNode) -> bool:
+            while worst:
+                _, _, _, version, node = heapq.heappop(worst)
+                if not node.in_open or version != node.version:
+                    continue
+                if node.children > 0 or node.father is None or node is current:
+                    continue
+                # Olvida la hoja y respalda su f en el padre, que vuelve a abiertos para poder regenerarla
+                node.in_open = False
+                del nodes[node.state.key()]
+                father = node.father
+                father.children -= 1
+                father.forgotten = min(father.forgotten, node.state.f)
+                if not father.in_open or father.forgotten < father.state.f:
+                    father.state.f = father.forgotten
+                    push(father)
+                return True
+            return False
+
+        push(root)
+        self.peak_nodes = 1
+        while best:
+            f, _, _, version, current = heapq.heappop(best)
+            if not current.in_open or version != current.version:
+                continue
+            if f == math.inf:
+                break
+            current.in_open = False
+
+            if current.state.equal_goal(self.final_state):
+                return self.build_path(current)
+
+            # Sin memoria para alargar el camino: el nodo no puede llevar a una solucion
+            if current.depth + 1 >= self.node_budget:
+                current.state.f = math.inf
+                push(current)
+                continue
+
+            successors = self.map.expand(current.state)
+            self.expanded += 1
+            if trace:
+                trace.record(self.expanded, current.state, len(nodes))
+            # En una reexpansion solo se regeneran los hijos olvidados con el mejor f respaldado
+            limit = current.state.f if current.forgotten < math.inf else math.inf
+            current.forgotten = math.inf
+            for successor_state in successors:
+                # Pathmax: los sucesores regenerados heredan el f respaldado del padre
+                successor_state.f = max(successor_state.f, current.state.f)
+                key = successor_state.key()
+                node = nodes.get(key)
+                if node is not None:
+                    if node.state.g <= successor_state.g:
+                        continue
+                    # Mejor camino a un nodo en memoria: se reengancha y se reabre
+                    father = node.father
+                    if father is not None:
+                        father.children -= 1
+                        # El antiguo padre sin hijos pasa a ser una hoja que se puede olvidar
+                        if father.children == 0 and not father.in_open:
+                            father.state.f = father.forgotten
+                            push(father)
+                    node.state = successor_state
+                    node.father = current
+                    node.depth = current.depth + 1
+                elif successor_state.f > limit:
+                    # Sigue olvidado: el padre recuerda el mejor f pendiente
+                    current.forgotten = min(current.forgotten, successor_state.f)
+                    continue
+                else:
+                    node = BoundedNode(successor_state, current)
+                    nodes[key] = node
+                current.children += 1
+                push(node)
+
+            # Vuelve a abiertos si quedan hijos olvidados, o con f infinito si no tiene ninguno en memoria
+            if current.forgotten < math.inf:
+                current.state.f = current.forgotten
+                push(current)
+            elif current.children == 0:
+                current.state.f = math.inf
+                push(current)
+
+            while len(nodes) > self.node_budget and forget_worst_leaf(current):
+                pass
+            self.peak_nodes = max(self.peak_nodes, len(nodes))
+        return []
+
+    def verbose(self, states: List[State]):
+        """
+        Muestra por pantalla el camino hasta el estado actual (el ultimo de states) sobre el mapa
+        """
+        # Calcula el nuevo camino
+        path = [state.getPosition() for state in states]
 
         os.system("clear")
         print("\nCAMINO anterior ->", len(path))
-        print("Current -> ", current_node.state)
+        print("Current -> ", states[-1])
 
         # Imprime por pantalla el camino
-        self.print_highlighted_positions(current_node.state.map, path)
+        self.print_highlighted_positions(self.map.stateMap(states[-1]), path)
 
         """
         time.sleep(1)
         input()
         """
 
-    def check_consistency(self, current_node: Node) -> None:
+    def check_consistency(self, state: State, father: State) -> None:
         """
         Comprueba consistencia h(n) <= c(n, m) +  h(m)
         """
-        if current_node.father:
-            hn = current_node.father.state.h
-            x, y = current_node.state.getPosition()
-            cnm = 1
-            if str(current_node.state.map[x][y]).isdigit():
-                cnm = int(current_node.state.map[x][y])
-            cnm *= HEURISTIC_ESCALE
-            if hn > cnm + current_node.state.h:
+        if father:
+            hn = father.h
+            cnm = self.map.move_cost(state.getPosition()) * self.map.heuristic_escale
+            if hn > cnm + state.h:
                 print(
                     "ERROR: ",
-                    f"h(n):\033[91m{round(hn, 2)}\033[0m <= c(n,m):{round(cnm, 2)} + h(m):{current_node.state.h} = \033[91m{round(cnm+current_node.state.h, 2)}\033[0m",
+                    f"h(n):\033[91m{round(hn, 2)}\033[0m <= c(n,m):{round(cnm, 2)} + h(m):{state.h} = \033[91m{round(cnm+state.h, 2)}\033[0m",
                     "\n\n",
                     "Current ->",
-                    current_node.state,
+                    state,
                     "\n",
                     "*" * 200,
                     "\n",
                     "Fahter ->",
-                    current_node.father.state,
+                    father,
                 )
                 sys.exit(1)
             else:
                 if self.verbose_flag == 1:
                     print(
-                        f"h(n):\033[92m{round(hn, 2)}\033[0m <= c(n,m):{round(cnm, 2)} + h(m):{current_node.state.h} = \033[92m{round(cnm+current_node.state.h, 2)}\033[0m"
+                        f"h(n):\033[92m{round(hn, 2)}\033[0m <= c(n,m):{round(cnm, 2)} + h(m):{state.h} = \033[92m{round(cnm+state.h, 2)}\033[0m"
                     )
 
-    def check_admissibility(self, current_node: Node) -> None:
+    def check_admissibility(self, state: State, father: State) -> None:
         """
         Comprueba admisibilidad h(n) <= coste optimo.
         *Esta pensado para comprobar la heuristica sobre el archivo medium1, el cual es mapa asequible para debuguear la mayoria de heuristicas
         """
-        if current_node.father:
-            hn = current_node.state.h
-            optimal = MEDIUM1_OPTIMAL * HEURISTIC_ESCALE
+        if father:
+            hn = state.h
+            optimal = MEDIUM1_OPTIMAL * self.map.heuristic_escale
             if hn > optimal:
                 print(
                     "ERROR ADMISIBILITY: ",
                     f"h(n):\033[91m{round(hn, 2)}\033[0m <= optimal: \033[91m{optimal}\033[0m",
                     "\n\n",
                     "Current ->",
-                    current_node.state,
+                    state,
                     "\n",
                 )
                 sys.exit(1)
@@ -210,41 +1043,105 @@ class ASTARTraslados:
                         f"h(n):\033[92m{round(hn, 2)}\033[0m <= optimal: \033[92m{optimal}\033[0m",
                     )
 
+    def solution_lines(self, path) -> list:
+        """
+        Lineas del plan en el formato del fichero .output: (fila,columna):casilla:energia
+        """
+        lines = []
+        for obj in path:
+            position = obj.getPosition()
+            type = self.map.map[position[0]][position[1]]
+            fuel = obj.ambulance.energy
+            lines.append(f"({position[0]},{position[1]}):{type}:{fuel}")
+        return lines
+
     def export_solution(self, path, output_file):
         with open(OUTPUT_PATH + output_file, "w") as archivo:
-            for obj in path:
-                # Asegúrate de ajustar los nombres de atributos según la estructura de tus objetos
-                position = obj.getPosition()
-                type = self.map.map[position[0]][position[1]]
-                fuel = obj.ambulance.energy
+            for linea in self.solution_lines(path):
+                archivo.write(linea + "\n")
+
+    def info(self, total_time, cost, len_path, nodes) -> dict:
+        """
+        Devuelve los datos de la ejecucion que se escriben en el fichero .stat
+        """
+        cache_stats = self.cache_usage()
+        return {
+            "Tiempo total": total_time,
+            "Coste total": cost,
+            "Longitud del plan": len_path,
+            "Nodos expandidos": nodes,
+            # Motor de busqueda y memoria usada
+            "Motor de busqueda": self.engine,
+            "Pico de nodos en memoria": self.peak_nodes,
+            # Uso de la cache de heuristica
+            "Cache heuristica aciertos": cache_stats["hits"],
+            "Cache heuristica fallos": cache_stats["misses"],
+            "Cache heuristica desalojos": cache_stats["evictions"],
+        } | self.ara_info() | self.frontier_info() | self.hda_info() | self.profile_info(total_time)
+
+    def cache_usage(self) -> dict:
+        """
+        Aciertos, fallos y desalojos de la cache de heuristica durante la ultima busqueda
+        """
+        return {
+            name: value - self.cache_start[name]
+            for name, value in self.map.cache_stats.items()
+        }
+
+    def ara_info(self) -> dict:
+        """
+        Cota de suboptimalidad de la solucion de ARA* (vacio con el resto de motores)
+        """
+        if self.engine != "ara":
+            return {}
+        return {"Cota de suboptimalidad": self.bound}
+
+    def frontier_info(self) -> dict:
+        """
+        Mayor frontera de las busquedas en haz y focal (vacio con el resto de motores)
+        """
+        if self.engine not in ["beam", "focal"]:
+            return {}
+        return {"Pico de frontera": self.peak_frontier}
+
+    def hda_info(self) -> dict:
+        """
+        Procesos de HDA* y reparto de las expansiones entre ellos (vacio con el resto de motores)
+        """
+        if self.engine != "hda":
+            return {}
+        return {
+            "Trabajadores": self.workers,
+            "Expansiones por trabajador": self.worker_expanded,
+        }
 
-                # Crea una cadena formateada y escríbela en el archivo
-                linea = f"({position[0]},{position[1]}):{type}:{fuel}\n"
-                archivo.write(linea)
+    def profile_info(self, total_time) -> dict:
+        """
+        Lineas del .stat con el desglose del modo --profile (vacio si no esta activo)
+        """
+        if self.profiler is None:
+            return {}
+        report = self.profile_report(total_time)
+        info = {f"Perfil tiempo {phase}": t for phase, t in report["tiempos"].items()}
+        info |= {f"Perfil {name}": n for name, n in report["contadores"].items()}
+        return info
 
     def export_info(self, output_file, total_time, cost, len_path, nodes):
         with open(OUTPUT_PATH + output_file, "w") as archivo:
-            # Asegúrate de ajustar los nombres de atributos según la estructura de tus objetos
+            # Crea una linea formateada por cada dato y escríbela en el archivo
+            for name, value in self.info(total_time, cost, len_path, nodes).items():
+                archivo.write(f"{name}: {value}\n")
 
-            # Crea una cadena formateada y escríbela en el archivo
-            linea = f"Tiempo total: {total_time}\nCoste total: {cost}\nLongitud del plan: {len_path}\nNodos expandidos: {nodes}\n"
-            archivo.write(linea)
+    def export_profile(self, output_file, total_time):
+        with open(OUTPUT_PATH + output_file, "w") as archivo:
+            json.dump(self.profile_report(total_time), archivo, indent=2)
 
 
-def parseArgs():
+def parseArgs(argv: list = None):
     parser = argparse.ArgumentParser(description="Descripción del script")
-    # Si no se proporcionan banderas, asume el modo de archivo
-    if len(sys.argv) == 3:
-        parser.file = sys.argv[1]
-        parser.mode = sys.argv[2]
-        parser.verbose = None
-        parser.admissibility = None
-        parser.check = None
-        parser.result = None
-        return parser
-
-    # Si se proporcionan banderas, utiliza argparse para analizar los argumentos
-
+    # Sin banderas tambien se acepta la forma abreviada: ASTARTraslados.py <mapa> <modo>
+    parser.add_argument("input_file", nargs="?", help="Archivo de entrada")
+    parser.add_argument("input_mode", nargs="?", help="Modo de algoritmo")
     parser.add_argument("--file", "-f", type=str, help="Archivo de entrada")
     parser.add_argument("--mode", "-m", type=str, help="Modo de algoritmo")
     parser.add_argument("--verbose", "-v", action="store_true", help="Modo verbose")
@@ -266,8 +1163,93 @@ def parseArgs():
         action="store_true",
         help="Reconstruye el camino si encuentra solucion",
     )
+    parser.add_argument(
+        "--distances",
+        "-d",
+        type=str,
+        choices=["exact", "euclidean"],
+        help="Distancia usada por las heuristicas (por defecto euclidean)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help=f"Entradas maximas de la cache de heuristica, 0 la desactiva (por defecto {HEURISTIC_CACHE_SIZE})",
+    )
+    parser.add_argument(
+        "--distp",
+        type=str,
+        choices=["python", "numpy"],
+        help="Implementacion de las metricas de distancia a pacientes (por defecto python)",
+    )
+    parser.add_argument(
+        "--no-map-cache",
+        action="store_true",
+        help=f"No lee ni guarda los datos precalculados del mapa en {MAP_CACHE_PATH}",
+    )
+    parser.add_argument(
+        "--engine",
+        "-e",
+        type=str,
+        choices=ENGINES,
+        help="Motor de busqueda (por defecto astar)",
+    )
+    parser.add_argument(
+        "--node-budget",
+        type=int,
+        help=f"Nodos maximos en memoria para los motores ida y sma (por defecto {NODE_BUDGET})",
+    )
+    parser.add_argument(
+        "--epsilon",
+        type=float,
+        help=f"Factor de inflado inicial de la heuristica para el motor ara (por defecto {ARA_EPSILON})",
+    )
+    parser.add_argument(
+        "--epsilon-step",
+        type=float,
+        help=f"Reduccion de epsilon tras cada solucion del motor ara (por defecto {ARA_EPSILON_STEP})",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        help=f"Procesos del motor hda (por defecto {HDA_WORKERS})",
+    )
+    parser.add_argument(
+        "--dominance",
+        action="store_true",
+        help="Descarta los estados dominados por otro con la misma configuracion, menor o igual g y mas energia",
+    )
+    parser.add_argument(
+        "--beam-width",
+        type=int,
+        help=f"Nodos que conserva cada capa del motor beam (por defecto {BEAM_WIDTH})",
+    )
+    parser.add_argument(
+        "--focal-weight",
+        type=float,
+        help=f"Factor de suboptimalidad del motor focal (por defecto {FOCAL_WEIGHT})",
+    )
+    parser.add_argument(
+        "--profile",
+        "-p",
+        action="store_true",
+        help="Mide el tiempo de cada fase de la busqueda y lo guarda en el .stat y en un .profile.json",
+    )
+    parser.add_argument(
+        "--trace",
+        type=str,
+        help="Fichero JSONL donde se escribe un evento por expansion (alternativa ligera a --verbose)",
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=int,
+        help=f"Guarda una de cada N expansiones en la traza (por defecto {TRACE_SAMPLE})",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    args.file = args.file or args.input_file
+    args.mode = args.mode or args.input_mode
+    return args
 
 
 def printResults(
@@ -294,11 +1276,20 @@ def printResults(
 
         print(f"TIEMPO ALGORITMO -> {round(total_time, 2)} segundos")
         print(f"NODOS EXPANDIDOS -> {astar_traslados.expanded}")
+        print(f"CACHE HEURISTICA -> {astar_traslados.cache_usage()}")
         print(
-            f"PARAMETROS:\n-> HEURISTIC ESCALE: {HEURISTIC_ESCALE}\n-> COUNT_FACTOR: {astar_traslados.map.COUNT_FACTOR}"
+            f"PARAMETROS:\n-> HEURISTIC ESCALE: {astar_traslados.map.heuristic_escale}\n-> COUNT_FACTOR: {astar_traslados.map.COUNT_FACTOR}"
         )
 
 
+def rescale(path: list, escale: float = HEURISTIC_ESCALE) -> None:
+    """
+    Deshace el escalado de los costes del camino (Map.heuristic_escale del mapa que lo ha generado)
+    """
+    for node in path:
+        node.g = node.g / escale
+
+
 def writeResults(
     file_name: str, astar_traslados: ASTARTraslados, resultado, total_time: float
 ):
@@ -332,11 +1323,20 @@ def writeResults(
     astar_traslados.export_info(
         info_file, total_time, resultado[-1].g, len(resultado), astar_traslados.expanded
     )
+    # Desglose del perfilado en formato JSON
+    if astar_traslados.profiler:
+        astar_traslados.export_profile(
+            info_file[: -len(".stat")] + ".profile.json", total_time
+        )
 
 
 def main():
     file_name = EASY_PATH
     mode = 0
+    distances = DISTANCES
+    cache_size = HEURISTIC_CACHE_SIZE
+    distp = DISTP
+    cache_path = MAP_CACHE_PATH
 
     # Parsear los argumentos
     args = parseArgs()
@@ -346,26 +1346,74 @@ def main():
         file_name = args.file
     if args.mode:
         mode = int(args.mode)
+    if args.distances:
+        distances = args.distances
+    if args.cache_size is not None:
+        cache_size = args.cache_size
+    if args.distp:
+        distp = args.distp
+    if args.no_map_cache:
+        cache_path = None
 
     # Configura ASTARTraslados segun las flags
-    astar_traslados = ASTARTraslados(file_name, mode)
+    try:
+        astar_traslados = ASTARTraslados(
+            file_name, mode, distances, cache_size, distp, cache_path
+        )
+    except ValueError as e:
+        print(f"Error de formato: {e}")
+        sys.exit(1)
     if args.verbose:
         astar_traslados.verbose_flag = 1
     if args.check:
         astar_traslados.check_flag = 1
     if args.admissibility:
         astar_traslados.check_ad = 1
+    if args.engine:
+        astar_traslados.engine = args.engine
+    if args.node_budget:
+        astar_traslados.node_budget = args.node_budget
+    if args.epsilon:
+        astar_traslados.epsilon = args.epsilon
+    if args.workers:
+        astar_traslados.workers = args.workers
+    if args.dominance:
+        astar_traslados.dominance = True
+    if args.beam_width:
+        astar_traslados.beam_width = args.beam_width
+    if args.focal_weight:
+        astar_traslados.focal_weight = args.focal_weight
+    if args.epsilon_step:
+        astar_traslados.epsilon_step = args.epsilon_step
+    if args.profile:
+        astar_traslados.enable_profile()
+    if args.trace:
+        astar_traslados.trace = SearchTrace(
+            args.trace, args.trace_sample or TRACE_SAMPLE
+        )
+
+    # ARA* escribe cada solucion intermedia para que siempre quede el mejor plan hasta el momento
+    def publish(path):
+        rescale(path, astar_traslados.map.heuristic_escale)
+        writeResults(file_name, astar_traslados, path, time.time() - inicio_tiempo)
+        print(f"SOLUCION -> coste {path[-1].g}, cota {astar_traslados.bound}")
+
+    astar_traslados.on_solution = publish
 
     # Busqueda del mejor cmaino
     resultado = []
     inicio_tiempo = time.time()
-    resultado = astar_traslados.search_path()
+    resultado = astar_traslados.search()
     fin_tiempo = time.time()
     total_time = fin_tiempo - inicio_tiempo
 
+    # Las busquedas incompletas (beam, ida y sma con poca memoria) pueden terminar sin solucion
+    if not resultado:
+        print("No se ha encontrado solucion")
+        sys.exit(1)
+
     # Reescala los costes
-    for node in resultado:
-        node.g = node.g / HEURISTIC_ESCALE
+    rescale(resultado, astar_traslados.map.heuristic_escale)
 
     if args.verbose or args.result:
         # Muestra los resultados por consola
@@ -0,0 +1,218 @@
+import os
+import sys
+import tempfile
+
+# Los modulos del proyecto se importan desde la raiz del repositorio, no desde el directorio del test
+ROOT_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path[0] = ROOT_PATH
+
+from ASTARTraslados import *
+from Generator.Generator import generate_map, write_map
+
+TEST_MAPS = ["ASTAR-test/easy2.csv", "ASTAR-test/easy.csv", "ASTAR-test/easy3.csv", "ASTAR-test/medium.csv"]
+# Mapas y modos de la prueba de dominancia: los de ASTAR-test que se resuelven en pocos segundos
+DOMINANCE_MAPS = TEST_MAPS + ["ASTAR-test/medium2.csv", "ASTAR-test/medium4.csv", "ASTAR-test/medium3.csv"]
+DOMINANCE_MODES = [5, 7]
+# Coste optimo de los mapas con los que se comparan los motores alternativos
+OPTIMAL_COSTS = {"ASTAR-test/easy.csv": 29, "ASTAR-test/medium.csv": 33}
+ENGINE_MODES = [5, 7]
+# Mapa generado con puntos de recarga (R): sin pasar por ellos no se llega a todos los pacientes
+GENERATED_SIZE = 40
+GENERATED_SEED = 1
+# Pesos de la busqueda focal: con 1 la lista focal solo admite nodos con el f minimo
+FOCAL_WEIGHTS = [1, 1.5, 2]
+# Anchos del haz: con los mas estrechos la busqueda puede quedarse sin solucion
+BEAM_WIDTHS = [1, 10, 100]
+# Procesos de HDA*: con uno es A* en otro proceso
+HDA_WORKER_COUNTS = [1, 2, 4]
+# Presupuesto pequeño de SMA*: obliga a olvidar hojas pero sigue cabiendo el camino optimo
+SMA_SMALL_BUDGET = 1000
+
+
+def print_colored(message, color):
+    colors = {
+        "reset": "\033[0m",
+        "green": "\033[32m",
+        "red": "\033[31m",
+    }
+    print(f"{colors[color]}{message}{colors['reset']}")
+
+
+def run_test(test_function, test_name):
+    try:
+        test_function()
+        print_colored(f"{test_name} passed", "green")
+    except AssertionError:
+        print_colored(f"{test_name} failed", "red")
+
+
+def search_cost(file_name: str, mode: int, tuning: str = FILE, **options) -> float:
+    """
+    Coste (sin escalar) de la solucion de search_path con las opciones indicadas
+    """
+    map = Map(os.path.join(ROOT_PATH, file_name), mode, cache_path=None, tuning=tuning, pdb_path=None)
+    astar_traslados = ASTARTraslados(None, map=map)
+    reopen = options.pop("reopen", None)
+    for name, value in options.items():
+        setattr(astar_traslados, name, value)
+    path = astar_traslados.search_path(reopen)
+    rescale(path, map.heuristic_escale)
+    return path[-1].g
+
+
+def search_engine(file_name: str, mode: int, engine: str, **options) -> tuple:
+    """
+    Camino (sin escalar) que devuelve el motor indicado y el buscador que lo encontro
+    """
+    map = Map(os.path.join(ROOT_PATH, file_name), mode, cache_path=None, pdb_path=None)
+    astar_traslados = ASTARTraslados(None, map=map)
+    astar_traslados.engine = engine
+    for name, value in options.items():
+        setattr(astar_traslados, name, value)
+    path = astar_traslados.search()
+    rescale(path, map.heuristic_escale)
+    return path, astar_traslados
+
+
+def valid_plan(astar_traslados: ASTARTraslados, path: list) -> bool:
+    """
+    Si el camino empieza en el estado inicial, cada paso es un sucesor del anterior y termina en la meta
+    """
+    if not path or path[0].key() != astar_traslados.initial_state.key():
+        return False
+    map = astar_traslados.map
+    for state, successor in zip(path, path[1:]):
+        if successor.key() not in {child.key() for child in map.expand(state)}:
+            return False
+    return path[-1].equal_goal(astar_traslados.final_state)
+
+
+def test_consistent_fast_path():
+    # Sin reabrir cerrados (camino rapido de los modos consistentes) el coste es el de la busqueda que reabre
+    for file_name in TEST_MAPS:
+        for mode in CONSISTENT_MODES:
+            assert search_cost(file_name, mode) == search_cost(file_name, mode, reopen=True)
+
+
+def test_fast_path_gate():
+    # Con escalas distintas de 1 la heuristica ya no es necesariamente consistente: no se usa el camino rapido
+    file_name = os.path.join(ROOT_PATH, TEST_MAPS[0])
+    for mode in CONSISTENT_MODES:
+        assert Map(file_name, mode, cache_path=None, pdb_path=None).consistent
+        for tuning in ["hard", "big"]:
+            assert not Map(file_name, mode, cache_path=None, tuning=tuning, pdb_path=None).consistent
+
+
+def test_dominance():
+    # La poda por dominancia solo descarta estados que no mejoran otro ya generado: el coste no cambia
+    for file_name in DOMINANCE_MAPS:
+        for mode in DOMINANCE_MODES:
+            assert search_cost(file_name, mode, dominance=True) == search_cost(file_name, mode)
+
+
+def test_ida():
+    # IDA* con la tabla de transposiciones entre iteraciones sigue encontrando el coste optimo
+    for file_name, cost in OPTIMAL_COSTS.items():
+        for mode in ENGINE_MODES:
+            path, _ = search_engine(file_name, mode, "ida")
+            assert path[-1].g == cost
+
+
+def test_sma():
+    # SMA* es optimo con el presupuesto por defecto y con uno pequeño que le obliga a olvidar nodos
+    for file_name, cost in OPTIMAL_COSTS.items():
+        for mode in ENGINE_MODES:
+            path, _ = search_engine(file_name, mode, "sma")
+            assert path[-1].g == cost
+        path, _ = search_engine(file_name, 5, "sma", node_budget=SMA_SMALL_BUDGET)
+        assert path[-1].g == cost
+
+
+def test_ara():
+    # El ultimo plan que publica ARA* tiene cota 1 y el coste optimo
+    for file_name, cost in OPTIMAL_COSTS.items():
+        for mode in ENGINE_MODES:
+            plans = []
+            path, astar_traslados = search_engine(file_name, mode, "ara", on_solution=plans.append)
+            assert astar_traslados.bound == 1
+            assert plans
+            assert valid_plan(astar_traslados, plans[-1])
+            rescale(plans[-1], astar_traslados.map.heuristic_escale)
+            assert plans[-1][-1].g == cost
+
+
+def test_focal():
+    # La busqueda focal devuelve un plan valido con coste como mucho el peso por el optimo
+    for file_name, cost in OPTIMAL_COSTS.items():
+        for mode in ENGINE_MODES:
+            for weight in FOCAL_WEIGHTS:
+                path, astar_traslados = search_engine(file_name, mode, "focal", focal_weight=weight)
+                assert valid_plan(astar_traslados, path)
+                assert path[-1].g <= weight * cost
+
+
+def test_beam():
+    # La busqueda en haz termina con cualquier ancho y devuelve un plan valido o ninguno
+    for file_name in OPTIMAL_COSTS:
+        for mode in ENGINE_MODES:
+            for width in BEAM_WIDTHS:
+                path, astar_traslados = search_engine(file_name, mode, "beam", beam_width=width)
+                assert path == [] or valid_plan(astar_traslados, path)
+
+
+def test_macro():
+    # El plan de macroacciones expandido a casillas se reproduce paso a paso hasta la meta
+    for file_name in DOMINANCE_MAPS:
+        for mode in ENGINE_MODES:
+            path, astar_traslados = search_engine(file_name, mode, "macro")
+            assert valid_plan(astar_traslados, path)
+
+
+def test_recharges():
+    # En un mapa generado los motores de macroacciones y en haz usan los puntos de recarga: macro encuentra
+    # un plan valido que no mejora el optimo de A* y el haz termina con un plan valido o ninguno
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "generated.csv")
+        write_map(generate_map(GENERATED_SIZE, GENERATED_SIZE, seed=GENERATED_SEED), file_name)
+        optimal, astar_traslados = search_engine(file_name, 7, "astar")
+        assert astar_traslados.map.recharges
+        path, astar_traslados = search_engine(file_name, 7, "macro")
+        assert valid_plan(astar_traslados, path)
+        assert path[-1].g >= optimal[-1].g
+        path, astar_traslados = search_engine(file_name, 7, "beam")
+        assert path == [] or valid_plan(astar_traslados, path)
+
+
+def test_hda():
+    # HDA* encuentra el coste optimo de A* con cualquier numero de procesos
+    for file_name, cost in OPTIMAL_COSTS.items():
+        for workers in HDA_WORKER_COUNTS:
+            path, astar_traslados = search_engine(file_name, 5, "hda", workers=workers)
+            assert valid_plan(astar_traslados, path)
+            assert path[-1].g == cost
+
+
+def test_hda_dead_worker():
+    # Si un proceso muere (aqui no encuentra el mapa) la busqueda falla en lugar de esperar para siempre
+    map = Map(os.path.join(ROOT_PATH, TEST_MAPS[0]), 5, cache_path=None, pdb_path=None)
+    map_args = (os.path.join(ROOT_PATH, "ASTAR-test", "missing.csv"),) + map.init_args[1:]
+    try:
+        hda_search(map_args, map.getInitialState(), 2)
+    except RuntimeError:
+        return
+    assert False
+
+
+if __name__ == "__main__":
+    run_test(test_consistent_fast_path, "Test camino rapido consistente")
+    run_test(test_fast_path_gate, "Test condicion del camino rapido")
+    run_test(test_dominance, "Test poda por dominancia")
+    run_test(test_ida, "Test IDA*")
+    run_test(test_sma, "Test SMA*")
+    run_test(test_ara, "Test ARA*")
+    run_test(test_focal, "Test busqueda focal")
+    run_test(test_beam, "Test busqueda en haz")
+    run_test(test_macro, "Test macroacciones")
+    run_test(test_recharges, "Test puntos de recarga")
+    run_test(test_hda, "Test HDA*")
+    run_test(test_hda_dead_worker, "Test HDA* con un proceso caido")
@@ -0,0 +1,101 @@
+from array import array
+import hashlib
+import json
+import mmap
+import os
+
+"""
+En este archivo se define la cache en disco de los datos precalculados de cada mapa
+"""
+
+MAP_CACHE_PATH = "./cache/"  # Directorio de la cache (un subdirectorio por contenido de mapa)
+
+
+class MapCache:
+    """
+    Guarda en disco el mapa ya parseado, sus puntos de interes, los campos de distancia y las escalas de
+    cada modo de heuristica. La clave es el hash del contenido del CSV, por lo que editar el mapa invalida
+    sus datos. Los campos de distancia se guardan como float64 y se leen proyectados con mmap, sin copias
+    """
+
+    def __init__(self, input_file: str, path: str = MAP_CACHE_PATH) -> None:
+        try:
+            with open(input_file, "rb") as file:
+                self.key = hashlib.sha1(file.read()).hexdigest()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"El archivo '{input_file}' no se encontró.")
+        self.directory = os.path.join(path, self.key)
+        self.buffer = None
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def write(self, name: str, write_function) -> None:
+        """
+        Escribe el fichero en un temporal y lo renombra, para que otro proceso nunca lea datos a medias
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        temp_name = self.path(f"{name}.{os.getpid()}.tmp")
+        with open(temp_name, "wb") as file:
+            write_function(file)
+        os.replace(temp_name, self.path(name))
+
+    def read_json(self, name: str):
+        try:
+            with open(self.path(name), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_json(self, name: str, data) -> None:
+        self.write(name, lambda file: file.write(json.dumps(data).encode()))
+
+    def load_map(self):
+        """
+        Devuelve la matriz del mapa y sus puntos de interes, o None si no estan en la cache (o se guardaron
+        antes de que se guardasen los puntos de recarga)
+        """
+        data = self.read_json("map.json")
+        if data is None or "recharges" not in data:
+            return None
+        return {
+            "map": data["map"],
+            "posN": [tuple(pos) for pos in data["posN"]],
+            "posC": [tuple(pos) for pos in data["posC"]],
+            "parking": tuple(data["parking"]),
+            "posCC": tuple(data["posCC"]),
+            "posCN": tuple(data["posCN"]),
+            "recharges": [tuple(pos) for pos in data["recharges"]],
+        }
+
+    def store_map(self, data: dict) -> None:
+        self.write_json("map.json", data)
+
+    def load_fields(self, pois: list, cells: int):
+        """
+        Proyecta en memoria los campos de distancia. Cada campo es una vista (memoryview) sobre el
+        fichero, en el mismo orden que pois. Devuelve None si no estan en la cache
+        """
+        try:
+            with open(self.path("fields.bin"), "rb") as file:
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        view = memoryview(self.buffer).cast("d")
+        if len(view) != len(pois) * cells:
+            return None
+        return {
+            poi: view[i * cells : (i + 1) * cells] for i, poi in enumerate(pois)
+        }
+
+    def store_fields(self, fields: dict, pois: list) -> None:
+        values = array("d")
+        for poi in pois:
+            values.extend(fields[poi])
+        self.write("fields.bin", values.tofile)
+
+    def load_escales(self, mode: int, distances: str, tuning: str):
+        return self.read_json(f"escales-{mode}-{distances}-{tuning}.json")
+
+    def store_escales(self, mode: int, distances: str, tuning: str, data: dict) -> None:
+        self.write_json(f"escales-{mode}-{distances}-{tuning}.json", data)
@@ -0,0 +1,197 @@
+from State.State import MAX_ENERGY
+import argparse
+import heapq
+import random
+
+"""
+En este archivo se define el generador de mapas aleatorios para medir como escala la busqueda
+"""
+
+GENERATOR_SEED = 0
+WALL_DENSITY = 0.15  # Fraccion de casillas que son muro (X)
+WEIGHTED_DENSITY = 0.1  # Fraccion de casillas de coste 2
+# Separacion entre los puntos de recarga (R), que se colocan en una rejilla regular por todo el mapa
+# para que los puntos de interes puedan estar lejos del parking. 0 no coloca ninguno
+RECHARGE_SPACING = MAX_ENERGY // 4
+PARKING_PLACEMENTS = ["random", "center", "corner"]
+
+
+def cell_costs(matrix: list, start: tuple, limit: float = None) -> dict:
+    """
+    Coste minimo desde start hasta cada casilla alcanzable con coste de como mucho limit (Dijkstra, el
+    coste es el de la casilla a la que se entra, como en Map.move_cost)
+    """
+    rows, columns = len(matrix), len(matrix[0])
+    costs = {start: 0}
+    heap = [(0, start)]
+    while heap:
+        cost, (x, y) = heapq.heappop(heap)
+        if cost > costs[(x, y)]:
+            continue
+        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < rows and 0 <= ny < columns) or matrix[nx][ny] == "X":
+                continue
+            new_cost = cost + (2 if matrix[nx][ny] == "2" else 1)
+            if limit is not None and new_cost > limit:
+                continue
+            if new_cost < costs.get((nx, ny), new_cost + 1):
+                costs[(nx, ny)] = new_cost
+                heapq.heappush(heap, (new_cost, (nx, ny)))
+    return costs
+
+
+def recharge_reach(matrix: list, parking: tuple, stations: list) -> dict:
+    """
+    Coste minimo hasta cada casilla desde la recarga mas cercana, contando solo el parking y los puntos
+    de recarga a los que se llega desde el parking saltando de uno a otro con una carga. Desde estas
+    recargas la ambulancia puede ir a cualquiera de las demas y volver a cargar
+    """
+    reached = [parking]
+    pending = set(stations)
+    reach = {}
+    for start in reached:
+        costs = cell_costs(matrix, start, MAX_ENERGY)
+        for pos, cost in costs.items():
+            if cost < reach.get(pos, cost + 1):
+                reach[pos] = cost
+        for station in [station for station in pending if station in costs]:
+            pending.discard(station)
+            reached.append(station)
+    return reach
+
+
+def generate_map(
+    rows: int,
+    columns: int,
+    patientsN: int = 4,
+    patientsC: int = 1,
+    walls: float = WALL_DENSITY,
+    weighted: float = WEIGHTED_DENSITY,
+    parking: str = "random",
+    spacing: int = RECHARGE_SPACING,
+    seed: int = GENERATOR_SEED,
+) -> list:
+    """
+    Genera la matriz de un mapa valido para Map.readMap. Los muros y las casillas de coste 2 se reparten
+    al azar con las densidades indicadas; el parking se coloca en una casilla al azar, en el centro o en
+    la esquina superior izquierda, y los puntos de recarga cada spacing casillas. CC, CN y los pacientes
+    se reparten al azar por todo el mapa entre las casillas distintas desde las que se puede volver a la
+    recarga de la que se sale con una sola carga, por lo que el mapa siempre tiene solucion. La misma
+    semilla genera siempre el mismo mapa
+    """
+    if parking not in PARKING_PLACEMENTS:
+        raise ValueError(f"Colocacion del parking desconocida '{parking}'")
+    rng = random.Random(seed)
+    matrix = []
+    for _ in range(rows):
+        row = []
+        for _ in range(columns):
+            value = rng.random()
+            row.append("X" if value < walls else "2" if value < walls + weighted else "1")
+        matrix.append(row)
+
+    if parking == "center":
+        parking_pos = (rows // 2, columns // 2)
+    elif parking == "corner":
+        parking_pos = (0, 0)
+    else:
+        parking_pos = (rng.randrange(rows), rng.randrange(columns))
+    stations = []
+    if spacing > 0:
+        stations = [
+            (i, j)
+            for i in range(spacing // 2, rows, spacing)
+            for j in range(spacing // 2, columns, spacing)
+            if (i, j) != parking_pos
+        ]
+    for x, y in [parking_pos] + stations:
+        matrix[x][y] = "1"
+
+    # Ida y vuelta desde la recarga mas cercana con una carga (al colocarlo, el punto cuesta 1)
+    reach = recharge_reach(matrix, parking_pos, stations)
+    occupied = set(stations) | {parking_pos}
+    candidates = sorted(
+        pos for pos, cost in reach.items() if 2 * cost <= MAX_ENERGY and pos not in occupied
+    )
+    needed = patientsN + patientsC + 2
+    if len(candidates) < needed:
+        raise ValueError(
+            f"Solo hay {len(candidates)} casillas accesibles desde las recargas para {needed} puntos de interes"
+        )
+
+    cells = rng.sample(candidates, needed)
+    matrix[parking_pos[0]][parking_pos[1]] = "P"
+    for x, y in stations:
+        matrix[x][y] = "R"
+    for pos, element in zip(cells, ["CC", "CN"] + ["N"] * patientsN + ["C"] * patientsC):
+        matrix[pos[0]][pos[1]] = element
+    return matrix
+
+
+def write_map(matrix: list, file_name: str) -> None:
+    with open(file_name, "w") as archivo:
+        archivo.write("\n".join(";".join(row) for row in matrix))
+        archivo.write("\n")
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description="Genera un mapa aleatorio en formato CSV")
+    parser.add_argument("output", type=str, help="Fichero CSV de salida")
+    parser.add_argument("--rows", "-r", type=int, default=20, help="Filas (por defecto 20)")
+    parser.add_argument("--columns", "-c", type=int, default=20, help="Columnas (por defecto 20)")
+    parser.add_argument(
+        "--patients-n", type=int, default=4, help="Pacientes No Contagiosos (por defecto 4)"
+    )
+    parser.add_argument(
+        "--patients-c", type=int, default=1, help="Pacientes Contagiosos (por defecto 1)"
+    )
+    parser.add_argument(
+        "--walls",
+        type=float,
+        default=WALL_DENSITY,
+        help=f"Fraccion de muros (por defecto {WALL_DENSITY})",
+    )
+    parser.add_argument(
+        "--weighted",
+        type=float,
+        default=WEIGHTED_DENSITY,
+        help=f"Fraccion de casillas de coste 2 (por defecto {WEIGHTED_DENSITY})",
+    )
+    parser.add_argument(
+        "--parking",
+        type=str,
+        default="random",
+        choices=PARKING_PLACEMENTS,
+        help="Colocacion del parking (por defecto random)",
+    )
+    parser.add_argument(
+        "--spacing",
+        type=int,
+        default=RECHARGE_SPACING,
+        help=f"Separacion entre puntos de recarga, 0 para no colocar ninguno (por defecto {RECHARGE_SPACING})",
+    )
+    parser.add_argument(
+        "--seed", "-s", type=int, default=GENERATOR_SEED, help="Semilla (por defecto 0)"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parseArgs()
+    matrix = generate_map(
+        args.rows,
+        args.columns,
+        args.patients_n,
+        args.patients_c,
+        args.walls,
+        args.weighted,
+        args.parking,
+        args.spacing,
+        args.seed,
+    )
+    write_map(matrix, args.output)
+
+
+if __name__ == "__main__":
+    main()
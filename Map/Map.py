@@ -1,8 +1,18 @@
 from typing import List, Tuple
 from State.State import *
+from PatternDB.PatternDB import PatternDatabase, pattern_size, PDB_PATH
+from Cache.Cache import MapCache, MAP_CACHE_PATH
+from collections import OrderedDict
 import copy
+import hashlib
+import heapq
 import math
 
+try:
+    import numpy as np
+except ImportError:  # NumPy solo es necesario para la version vectorizada de calculate_distP
+    np = None
+
 MAP_PATH = "input/map.csv"
 ERROR_PATH = "input/error.csv"
 DEBUG_PATH = "input/debug.csv"
@@ -11,31 +21,102 @@ EASY_PATH2 = "input/easy2.csv"
 
 MAP_HEURISTIC_ESCALE = {"hard": 0.91, "medium3": 0.94, "default": 1, "big": 3}
 MAP_COUNT_FACTOR = {"hard": 0.29, "medium3": 0.29, "default": 0.5}
-FILE = "default"
+FILE = "default"  # Ajuste por defecto de MAP_HEURISTIC_ESCALE y MAP_COUNT_FACTOR
 NUM_PASSENGER = 0
 DEFAULT_COST = 1
 HEURISTIC_ESCALE = MAP_HEURISTIC_ESCALE[FILE]
 DECREMENT = 0.99999  # Coeficiente que indica el % que representa el peso del siguiente target (Pacientes, CentroC, CentroN, Parking)
 MINMAX_N_WEIGHT = 1.25
 DEFAULT_WEIGHT = 1
+HEURISTIC_CACHE_SIZE = 200000  # Entradas maximas de la cache de heuristica (0 la desactiva)
+DISTP = "python"  # Implementacion de calculate_distP: "python" o "numpy" (vectorizada)
+CONSISTENT_MODES = {3, 7}  # Modos cuya heuristica es consistente: A* no necesita reabrir cerrados
+DISTANCES = "euclidean"  # Distancia usada por las heuristicas: "euclidean" o "exact" (Dijkstra sobre el mapa)
+
+# Codigos de la rejilla compacta de tipos de casilla (Map.cells)
+CELL_ROAD = 0  # Casilla de paso (coste 1 o 2) o paciente ya recogido
+CELL_WALL = 1
+CELL_N = 2
+CELL_C = 3
+CELL_P = 4  # Parking o punto de recarga (R): ambos recargan la energia, pero solo el parking es la meta
+CELL_CC = 5
+CELL_CN = 6
+CELL_CODES = {
+    "1": CELL_ROAD,
+    "2": CELL_ROAD,
+    "X": CELL_WALL,
+    "N": CELL_N,
+    "C": CELL_C,
+    "P": CELL_P,
+    "R": CELL_P,
+    "CC": CELL_CC,
+    "CN": CELL_CN,
+}
 
 
 class Map:
-    def __init__(self, input_file: str, mode: int = 0) -> None:
+    def __init__(
+        self,
+        input_file: str,
+        mode: int = 0,
+        distances: str = DISTANCES,
+        cache_size: int = HEURISTIC_CACHE_SIZE,
+        distp: str = DISTP,
+        cache_path: str = MAP_CACHE_PATH,
+        tuning: str = FILE,
+        source: str = None,
+        pdb_path: str = PDB_PATH,
+    ) -> None:
+        # Argumentos del constructor, para construir el mismo mapa en otro proceso (HDA*)
+        self.init_args = (
+            input_file,
+            mode,
+            distances,
+            cache_size,
+            distp,
+            cache_path,
+            tuning,
+            source,
+            pdb_path,
+        )
         # Posiciones significativas dentro del mapa
         self.posN = []
         self.posC = []
         self.parking = (0, 0)
         self.posCC = (0, 0)
         self.posCN = (0, 0)
+        # Puntos de recarga (R): recargan la energia como el parking, pero no son la meta
+        self.recharges = []
         self.escales = {}
         self.heuristic_mode = mode
+        # Escala de los costes y de las heuristicas del ajuste elegido
+        self.tuning = tuning
+        self.heuristic_escale = MAP_HEURISTIC_ESCALE[tuning]
+        # Cache LRU de la heuristica, indexada por la parte del estado de la que depende
+        self.heuristic_cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
         # Coeficiente para decidir peso de pacientes restantes. 0 total importancia distancias, 1 total importancia restantes
-        self.COUNT_FACTOR = MAP_COUNT_FACTOR[FILE]
-        # Matriz de mapa
-        self.map = self.readMap(input_file)
+        self.COUNT_FACTOR = MAP_COUNT_FACTOR.get(tuning, MAP_COUNT_FACTOR["default"])
+        # Cache en disco de los datos precalculados del mapa (None la desactiva). Los mapas construidos
+        # desde el contenido del CSV (source) no usan la cache
+        self.map_cache = (
+            MapCache(input_file, cache_path) if cache_path and source is None else None
+        )
+        # Matriz de mapa (inmutable, los estados solo guardan que pacientes han recogido)
+        self.map = self.load_map(input_file, source)
         self.rows = len(self.map)
         self.columns = len(self.map[0])
+        # Rejillas planas (indice x * columns + y) con el codigo de cada casilla y el coste de entrar en ella,
+        # para que la generacion de sucesores no compare ni convierta cadenas
+        self.cells, self.costs = self.build_grids()
+        self.map_hash = hashlib.sha1(
+            "\n".join(";".join(row) for row in self.map).encode()
+        ).hexdigest()
+        # Bit de cada paciente dentro de la mascara de recogidos de los estados
+        self.patient_bits = {
+            pos: 1 << i for i, pos in enumerate(self.posN + self.posC)
+        }
         # Movimiento legales
         self.movements = [
             (0, 1),
@@ -43,8 +124,35 @@ class Map:
             (1, 0),
             (-1, 0),
         ]
-        self.mean = self.mean_Manhattan()
-        self.calculate_escales()
+        # Codigo de accion (un byte) de cada movimiento, para guardar caminos como secuencias de acciones
+        self.actions = {movement: i for i, movement in enumerate(self.movements)}
+        # Campos de distancia exacta desde cada casilla hasta cada punto de interes. Solo se cargan (o
+        # calculan) si se usan: con distancias exactas aqui mismo y, si no, al primer acceso (macro)
+        self.loaded_fields = None
+        self.distance_mode = distances
+        if distances == "exact":
+            self.loaded_fields = self.load_distance_fields()
+        self.dist = self.distance if distances == "exact" else self.Manhattan
+        self.load_escales()
+        # Implementacion de las metricas de distancia a pacientes
+        self.distp_mode = distp
+        if distp == "numpy":
+            self.patient_arrays = self.build_patient_arrays()
+            self.calculate_distP = self.calculate_distP_numpy
+        # Bases de datos de patrones, solo se cargan (o calculan) si se usa su heuristica
+        self.pattern_databases = (
+            self.build_pattern_databases(path=pdb_path) if mode == 7 else []
+        )
+        # Operador de cada codigo de casilla (los muros nunca se expanden)
+        self.operators = (
+            self.operatorsO,
+            None,
+            self.operatorsN,
+            self.operatorsC,
+            self.operatorsP,
+            self.operatorsCC,
+            self.operatorsCN,
+        )
         # Diccionario de funciones heurísticas
         self.heuristic_functions = {
             6: self.heuristic1,
@@ -53,53 +161,208 @@ class Map:
             4: self.heuristic_basic_escaled,
             5: self.heuristic_astar,
             1: self.heuristic_astar2,
+            7: self.heuristic_pdb,
         }
 
+    @classmethod
+    def from_string(
+        cls,
+        contents: str,
+        mode: int = 0,
+        distances: str = DISTANCES,
+        cache_size: int = HEURISTIC_CACHE_SIZE,
+        distp: str = DISTP,
+        tuning: str = FILE,
+    ) -> "Map":
+        """
+        Construye el mapa a partir del contenido del CSV sin leer ni escribir ficheros: no usa la cache
+        en disco y las tablas de patrones se calculan en memoria
+        """
+        return cls(None, mode, distances, cache_size, distp, None, tuning, contents, None)
+
+    def enable_profile(self, profiler) -> None:
+        """
+        Envuelve la generacion de sucesores y las funciones heuristicas para que el perfilador mida su tiempo.
+        Todos los motores generan sus sucesores con expand, por lo que ahi se cuentan los nodos generados
+        """
+        self.expand = profiler.timed("expand", self.expand, "nodos generados")
+        self.heuristic = profiler.timed("heuristica", self.heuristic)
+        for name in [
+            "calculate_distP",
+            "calculate_distCP",
+            "heuristic_basic",
+            "heuristic_basic_escaled",
+            "heuristic1",
+            "heuristic2",
+            "heuristic_astar",
+            "heuristic_astar2",
+            "heuristic_pdb",
+        ]:
+            setattr(self, name, profiler.timed(name, getattr(self, name)))
+        self.heuristic_functions = {
+            mode: getattr(self, function.__name__)
+            for mode, function in self.heuristic_functions.items()
+        }
+
+    def load_map(self, input_file: str, source: str = None) -> list:
+        """
+        Lee la matriz y los puntos de interes de la cache o, si no estan, parsea el CSV y los guarda. Si
+        se indica source se parsea ese contenido en lugar del fichero
+        """
+        if source is not None:
+            return self.parseMap(source.splitlines())
+
+        if self.map_cache:
+            data = self.map_cache.load_map()
+            if data:
+                self.posN, self.posC = data["posN"], data["posC"]
+                self.parking, self.posCC, self.posCN = (
+                    data["parking"],
+                    data["posCC"],
+                    data["posCN"],
+                )
+                self.recharges = data["recharges"]
+                return data["map"]
+
+        matrix = self.readMap(input_file)
+        if self.map_cache:
+            self.map_cache.store_map(
+                {
+                    "map": matrix,
+                    "posN": self.posN,
+                    "posC": self.posC,
+                    "parking": self.parking,
+                    "posCC": self.posCC,
+                    "posCN": self.posCN,
+                    "recharges": self.recharges,
+                }
+            )
+        return matrix
+
+    def build_grids(self) -> tuple:
+        """
+        Convierte la matriz de cadenas en la rejilla de codigos de casilla y la de costes de entrada
+        """
+        cells = bytearray(self.rows * self.columns)
+        costs = bytearray(self.rows * self.columns)
+        for i, row in enumerate(self.map):
+            for j, element in enumerate(row):
+                cells[i * self.columns + j] = CELL_CODES[element]
+                costs[i * self.columns + j] = (
+                    int(element) if element.isdigit() else DEFAULT_COST
+                )
+        return cells, costs
+
+    @property
+    def consistent(self) -> bool:
+        """
+        Si la heuristica es consistente y A* puede tratar los cerrados como definitivos. Solo se garantiza
+        para los modos de CONSISTENT_MODES con el ajuste sin escala: con heuristic_escale < 1 el modo 3
+        resta un paciente entero en un paso de coste heuristic_escale, y el resto de escalas no se ha
+        comprobado
+        """
+        return self.heuristic_mode in CONSISTENT_MODES and self.heuristic_escale == 1
+
+    @property
+    def distance_fields(self) -> dict:
+        if self.loaded_fields is None:
+            self.loaded_fields = self.load_distance_fields()
+        return self.loaded_fields
+
+    def load_distance_fields(self) -> dict:
+        """
+        Proyecta los campos de distancia de la cache o, si no estan, los calcula y los guarda
+        """
+        pois = self.points_of_interest()
+        if self.map_cache:
+            fields = self.map_cache.load_fields(pois, self.rows * self.columns)
+            if fields:
+                return fields
+
+        fields = self.calculate_distance_fields()
+        if self.map_cache:
+            self.map_cache.store_fields(fields, pois)
+        return fields
+
+    def load_escales(self) -> None:
+        """
+        Lee de la cache la media de distancias y las escalas del modo actual o, si no estan, las calcula
+        """
+        mode, distances = self.heuristic_mode, self.distance_mode
+        if self.map_cache:
+            data = self.map_cache.load_escales(mode, distances, self.tuning)
+            if data:
+                self.mean = data["mean"]
+                self.escales = data["escales"]
+                self.COUNT_FACTOR = data["COUNT_FACTOR"]
+                return
+
+        self.mean = self.mean_Manhattan()
+        self.calculate_escales()
+        if self.map_cache:
+            self.map_cache.store_escales(
+                mode,
+                distances,
+                self.tuning,
+                {
+                    "mean": self.mean,
+                    "escales": self.escales,
+                    "COUNT_FACTOR": self.COUNT_FACTOR,
+                },
+            )
+
     def readMap(self, file_path: str) -> list:
-        matrix = []
         try:
             with open(file_path, "r") as file:
-                for i, line in enumerate(file):
-                    row = line.strip().split(";")
-                    if i == 0:
-                        # Validar que todas las filas tengan la misma longitud
-                        if i > 0 and len(row) != len(matrix[0]):
-                            raise ValueError(
-                                "Las filas del mapa no tienen la misma longitud."
-                            )
-                    matrix.append(row)
-
-                    for j, element in enumerate(row):
-                        # Validar elementos desconocidos
-                        if element not in {
-                            "N",
-                            "C",
-                            "P",
-                            "CC",
-                            "CN",
-                            "1",
-                            "2",
-                            "X",
-                        }:
-                            raise ValueError(
-                                f"Elemento desconocido en la posición ({i}, {j}): {element}"
-                            )
-
-                        if element == "N":
-                            self.posN.append((i, j))
-                        elif element == "C":
-                            self.posC.append((i, j))
-                        elif element == "P":
-                            self.parking = (i, j)
-                        elif element == "CC":
-                            self.posCC = (i, j)
-                        elif element == "CN":
-                            self.posCN = (i, j)
+                return self.parseMap(file)
         except FileNotFoundError:
             raise FileNotFoundError(f"El archivo '{file_path}' no se encontró.")
-        except ValueError as e:
-            print(f"Error de formato: {e}")
-            exit(1)
+
+    def parseMap(self, lines) -> list:
+        """
+        Parsea las lineas del CSV y guarda los puntos de interes. Lanza ValueError si el formato no es
+        valido, sin escribir nada ni terminar el proceso
+        """
+        matrix = []
+        for i, line in enumerate(lines):
+            row = line.strip().split(";")
+            if i == 0:
+                # Validar que todas las filas tengan la misma longitud
+                if i > 0 and len(row) != len(matrix[0]):
+                    raise ValueError(
+                        "Las filas del mapa no tienen la misma longitud."
+                    )
+            matrix.append(row)
+
+            for j, element in enumerate(row):
+                # Validar elementos desconocidos
+                if element not in {
+                    "N",
+                    "C",
+                    "P",
+                    "R",
+                    "CC",
+                    "CN",
+                    "1",
+                    "2",
+                    "X",
+                }:
+                    raise ValueError(
+                        f"Elemento desconocido en la posición ({i}, {j}): {element}"
+                    )
+
+                if element == "N":
+                    self.posN.append((i, j))
+                elif element == "C":
+                    self.posC.append((i, j))
+                elif element == "P":
+                    self.parking = (i, j)
+                elif element == "CC":
+                    self.posCC = (i, j)
+                elif element == "CN":
+                    self.posCN = (i, j)
+                elif element == "R":
+                    self.recharges.append((i, j))
 
         return matrix
 
@@ -109,7 +372,6 @@ class Map:
         """
         ambulance = Ambulance(pos=self.parking)
         initial_state = State(ambulance=ambulance)
-        self.copyMap(initial_state)
         initial_state.h = self.heuristic(initial_state)
         return initial_state
 
@@ -131,7 +393,7 @@ class Map:
         Comprueba si la posicion pasada por parametro es transitable dentro del mapa
         """
         x, y = position
-        return self.map[x][y] == "X"
+        return self.cells[x * self.columns + y] == CELL_WALL
 
     def is_valid(self, position: Tuple[int, int]) -> bool:
         """
@@ -139,7 +401,9 @@ class Map:
         """
         x, y = position
         return (
-            0 <= x < self.rows and 0 <= y < self.columns and not self.is_wall(position)
+            0 <= x < self.rows
+            and 0 <= y < self.columns
+            and self.cells[x * self.columns + y] != CELL_WALL
         )
 
     def expand(self, state: State) -> List[State]:
@@ -148,47 +412,80 @@ class Map:
         """
         successors = []
         x, y = state.getPosition()
+        rows, columns, cells = self.rows, self.columns, self.cells
 
         # Calcula las casillas resultantes tras aplicar los movimientso
         for dx, dy in self.movements:
-            new_position = (x + dx, y + dy)
+            nx, ny = x + dx, y + dy
 
             # Valida las nuevas posiciones
-            if self.is_valid(new_position):
+            if 0 <= nx < rows and 0 <= ny < columns and cells[nx * columns + ny] != CELL_WALL:
                 # Crea una copia de estado en el sucesor
                 successor = copy.copy(state)
                 # Aplica los operadores que sean posibles
-                self.applyOperators(successor, state, new_position, successors)
+                self.applyOperators(successor, state, (nx, ny), successors)
         return successors
 
+    def step(self, state: State, action: int) -> State:
+        """
+        Devuelve el sucesor de state al aplicar el movimiento con codigo action (None si no es valido)
+        """
+        dx, dy = self.movements[action]
+        x, y = state.getPosition()
+        new_position = (x + dx, y + dy)
+        successors = []
+        if self.is_valid(new_position):
+            self.applyOperators(copy.copy(state), state, new_position, successors)
+        return successors[0] if successors else None
+
+    def drive(self, state: State, target: Tuple[int, int]):
+        """
+        Conduce desde state hasta el punto de interes target por un camino de coste minimo, bajando por su
+        campo de distancias y aplicando en cada casilla los mismos operadores que expand (recoger, dejar
+        pacientes, recargar). Devuelve el estado de llegada y los codigos de accion del camino, o None si
+        la ambulancia se queda sin energia por el camino o ningun vecino baja por el campo de distancias
+        """
+        field = self.distance_fields[target]
+        columns = self.columns
+        actions = bytearray()
+        position = state.getPosition()
+        while position != target:
+            remaining = field[position[0] * columns + position[1]]
+            if remaining == math.inf:
+                return None
+            for action, (dx, dy) in enumerate(self.movements):
+                neighbour = (position[0] + dx, position[1] + dy)
+                if (
+                    self.is_valid(neighbour)
+                    and field[neighbour[0] * columns + neighbour[1]]
+                    + self.move_cost(neighbour)
+                    == remaining
+                ):
+                    break
+            else:
+                return None
+            state = self.step(state, action)
+            if state is None:
+                return None
+            actions.append(action)
+            position = state.getPosition()
+        return state, bytes(actions)
+
     def applyOperators(self, successor, state, new_position, successors):
         """
         Este metodo se encarga de aplicar los operadores indicados según el tipo de casilla
         """
-        cell_type = successor.map[new_position[0]][new_position[1]]
-
-        if cell_type == "N":
-            self.operatorsN(successor, state, new_position, successors)
-        elif cell_type == "C":
-            self.operatorsC(successor, state, new_position, successors)
-        elif cell_type == "P":
-            self.operatorsP(successor, state, new_position, successors)
-        elif cell_type == "CC":
-            self.operatorsCC(successor, state, new_position, successors)
-        elif cell_type == "CN":
-            self.operatorsCN(successor, state, new_position, successors)
-        else:
-            self.operatorsO(successor, state, new_position, successors)
+        code = self.cell_code(successor, new_position)
+        self.operators[code](successor, state, new_position, successors)
 
     def operatorsN(self, successor, state, new_position, successors):
-        cell_type = successor.map[new_position[0]][new_position[1]]
         # Aplica operador de movimiento y añadir pasajero
         if not successor.move(new_position, DEFAULT_COST):
             return
-        successor.addPassenger("N", new_position)
+        successor.addPassenger("N", new_position, self.patient_bits[new_position])
 
         # Actualiza funcion objetivo
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
 
     def operatorsC(self, successor, state, new_position, successors) -> bool:
@@ -197,8 +494,7 @@ class Map:
             return False
         self.addContagious(successor, new_position)
 
-        cell_type = successor.map[new_position[0]][new_position[1]]
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
         return True
 
@@ -207,10 +503,9 @@ class Map:
         if not successor.move(new_position, DEFAULT_COST):
             return False
 
-        cell_type = successor.map[new_position[0]][new_position[1]]
         successor.ambulance.reloadEnergy()
 
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
         return True
 
@@ -221,8 +516,7 @@ class Map:
         successor.leaveContagious()
 
         # Actualiza funcion objetivo
-        cell_type = successor.map[new_position[0]][new_position[1]]
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
         return True
 
@@ -233,20 +527,18 @@ class Map:
         successor.leaveNotContagious()
 
         # Actualiza la funcion objetivo
-        cell_type = successor.map[new_position[0]][new_position[1]]
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
         return True
 
     def operatorsO(self, successor, state, new_position, successors) -> bool:
-        cost = int(successor.map[new_position[0]][new_position[DEFAULT_COST]])
+        cost = self.costs[new_position[0] * self.columns + new_position[1]]
         # Aplica el operador de movimiento si hay energia
         if not successor.move(new_position, cost):
             return False
 
         # Actualiza funcion objetivo
-        cell_type = successor.map[new_position[0]][new_position[1]]
-        self.update_f(successor, state, new_position, cell_type)
+        self.update_f(successor, state, new_position)
         successors.append(successor)
         return True
 
@@ -260,14 +552,12 @@ class Map:
             return
 
         # Se han recogido a todos los No Contagiosos y si hay hueco intenta subir
-        successor.addPassenger("C", new_position)
-
-    def update_f(self, successor, state, new_position, cell_type):
-        cost = DEFAULT_COST
-        if str(cell_type).isdigit():
-            cost = int(cell_type)
-        cost *= HEURISTIC_ESCALE
-        successor.g = state.g + cost
+        successor.addPassenger("C", new_position, self.patient_bits[new_position])
+
+    def update_f(self, successor, state, new_position):
+        # Los pacientes recogidos dejan una casilla de coste DEFAULT_COST, el mismo que el de la rejilla
+        cost = self.costs[new_position[0] * self.columns + new_position[1]]
+        successor.g = state.g + cost * self.heuristic_escale
         successor.h = self.heuristic(successor)
         successor.f = successor.g + successor.h
 
@@ -276,11 +566,37 @@ class Map:
         Este metodo se encarga de devolver el valor de la heuristica seleccionada
         """
         # Verificar si el modo de heurística es válido
-        if self.heuristic_mode in self.heuristic_functions:
-            # Llamar a la función correspondiente
-            return self.heuristic_functions[self.heuristic_mode](state)
-        else:
+        if self.heuristic_mode not in self.heuristic_functions:
             return 0
+        if self.cache_size <= 0:
+            return self.heuristic_functions[self.heuristic_mode](state)
+
+        # Las heuristicas no dependen de la energia: el mismo valor sirve para cualquier nivel de bateria
+        ambulance = state.ambulance
+        key = (
+            ambulance.pos,
+            state.picked,
+            ambulance.PN,
+            ambulance.PCN,
+            ambulance.PCC,
+            state.CC,
+            state.CN,
+        )
+        cache = self.heuristic_cache
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+            self.cache_stats["hits"] += 1
+            return value
+
+        # Llamar a la función correspondiente
+        self.cache_stats["misses"] += 1
+        value = self.heuristic_functions[self.heuristic_mode](state)
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+            self.cache_stats["evictions"] += 1
+        return value
 
     def heuristic_basic(self, state: State):
         """
@@ -319,13 +635,14 @@ class Map:
             self.COUNT_FACTOR = 1
 
         # Factor multiplicativo para pacientes restantes por recoger y trasladar al centro
-        MAX_COUNT_SCALE = HEURISTIC_ESCALE / (num_passenger / 2)
+        escale = self.heuristic_escale
+        MAX_COUNT_SCALE = escale / (num_passenger / 2)
         COUNT_SCALE = self.COUNT_FACTOR * MAX_COUNT_SCALE
 
         # Escala para la distancia a pacientes
         MAX_DECREASE = (num_passenger / 2) * COUNT_SCALE
-        DIST_FACTOR = (HEURISTIC_ESCALE - MAX_DECREASE) / HEURISTIC_ESCALE
-        DIST_ESCALE = HEURISTIC_ESCALE * DIST_FACTOR
+        DIST_FACTOR = (escale - MAX_DECREASE) / escale
+        DIST_ESCALE = escale * DIST_FACTOR
 
         # Escalas para distancias a Centro Contagiosos, Centro No Contagiosos y Parking
         CC_ESCALE = DECREMENT * DIST_ESCALE
@@ -343,24 +660,24 @@ class Map:
     def calculate_distP(self, state: State) -> dict:
         # Calcula la distancia a cada paciente sin recoger
         dist_stateN = [
-            (self.Manhattan(state.getPosition(), pos), pos)
+            (self.dist(state.getPosition(), pos), pos)
             for pos in self.posN
-            if state.map[pos[0]][pos[1]] == "N"
+            if not state.picked & self.patient_bits[pos]
         ]
         dist_stateNEu = [
             (self.Euclidean(state.getPosition(), pos), pos)
             for pos in self.posN
-            if state.map[pos[0]][pos[1]] == "C"
+            if self.cell_code(state, pos) == CELL_C
         ]
         dist_stateC = [
-            (self.Manhattan(state.getPosition(), pos), pos)
+            (self.dist(state.getPosition(), pos), pos)
             for pos in self.posC
-            if state.map[pos[0]][pos[1]] == "C"
+            if not state.picked & self.patient_bits[pos]
         ]
         dist_stateCEu = [
             (self.Euclidean(state.getPosition(), pos), pos)
             for pos in self.posC
-            if state.map[pos[0]][pos[1]] == "C"
+            if not state.picked & self.patient_bits[pos]
         ]
 
         dist_stateC = sorted(dist_stateC, key=lambda x: x[0])
@@ -424,11 +741,128 @@ class Map:
             "maxN": max_distN,
         }
 
+    def build_patient_arrays(self) -> dict:
+        """
+        Prepara las coordenadas (y los campos de distancia exacta) de los pacientes en arrays de NumPy
+        para calculate_distP_numpy. Los pacientes siguen el orden de sus bits: primero posN y despues posC
+        """
+        if np is None:
+            raise ImportError(
+                "La version numpy de calculate_distP necesita tener NumPy instalado"
+            )
+        cells = self.rows * self.columns
+        # Los campos solo se leen con distancias exactas
+        fields = self.distance_fields if self.distance_mode == "exact" else {}
+        return {
+            "nN": len(self.posN),
+            "total": len(self.posN) + len(self.posC),
+            "nbytes": (len(self.posN) + len(self.posC)) // 8 + 1,
+            "posN": np.array(self.posN, dtype=np.int64).reshape(-1, 2),
+            "posC": np.array(self.posC, dtype=np.int64).reshape(-1, 2),
+            "fieldsN": np.array(
+                [fields[pos] for pos in self.posN if pos in fields], dtype=np.float64
+            ).reshape(-1, cells),
+            "fieldsC": np.array(
+                [fields[pos] for pos in self.posC if pos in fields], dtype=np.float64
+            ).reshape(-1, cells),
+        }
+
+    def calculate_distP_numpy(self, state: State) -> dict:
+        """
+        Version vectorizada de calculate_distP. Calcula las mismas metricas con operaciones sobre arrays
+        enmascarados por los pacientes pendientes y devuelve exactamente los mismos valores: las
+        ordenaciones son estables y los sumatorios se acumulan en el mismo orden (cumsum)
+        """
+        arrays = self.patient_arrays
+        x, y = state.getPosition()
+
+        # Pacientes pendientes de recoger a partir de la mascara de bits del estado
+        picked = np.unpackbits(
+            np.frombuffer(
+                state.picked.to_bytes(arrays["nbytes"], "little"), dtype=np.uint8
+            ),
+            bitorder="little",
+        )
+        remainingN = picked[: arrays["nN"]] == 0
+        remainingC = picked[arrays["nN"] : arrays["total"]] == 0
+        posN = arrays["posN"][remainingN]
+        posC = arrays["posC"][remainingC]
+
+        # Distancias a cada paciente sin recoger
+        euclideanC = np.sqrt((x - posC[:, 0]) ** 2 + (y - posC[:, 1]) ** 2)
+        if self.distance_mode == "exact":
+            index = x * self.columns + y
+            distN = arrays["fieldsN"][remainingN, index]
+            distC = arrays["fieldsC"][remainingC, index]
+        else:
+            distN = np.sqrt((x - posN[:, 0]) ** 2 + (y - posN[:, 1]) ** 2)
+            distC = euclideanC
+
+        orderN = np.argsort(distN, kind="stable")
+        orderC = np.argsort(distC, kind="stable")
+        distN, posN = distN[orderN], posN[orderN]
+        dist_all = np.concatenate((distN, distC[orderC]))
+        pos_all = np.concatenate((posN, posC[orderC]))
+        order = np.argsort(dist_all, kind="stable")
+        dist_all, pos_all = dist_all[order], pos_all[order]
+
+        # SUMATORIOS (las casillas de posN nunca se leen como "C", por lo que sumEu solo incluye posC)
+        count, countN = len(dist_all), len(distN)
+        sum_dist = np.cumsum(dist_all)[-1].item() if count else 0
+        sum_dist2 = np.cumsum(dist_all[: count // 2])[-1].item() if count >= 2 else 0
+        sum_distN = np.cumsum(distN)[-1].item() if countN else 0
+        sum_distEu = np.cumsum(euclideanC)[-1].item() if len(euclideanC) else 0
+
+        # Pares (distancia, posicion) ordenados, con los tipos de Python de la version original
+        dist_state = list(
+            zip(dist_all.tolist(), [tuple(pos) for pos in pos_all.tolist()])
+        )
+        dist_stateN = list(zip(distN.tolist(), [tuple(pos) for pos in posN.tolist()]))
+
+        min_distP = dist_state[0] if dist_state else (0, None)
+        max_distP = dist_state[-1] if dist_state else (0, None)
+        max_distN = dist_stateN[-1] if dist_stateN else (0, None)
+
+        # Metricas minmax: el i-esimo mas cercano con el i-esimo mas lejano
+        minmax_dists = [(min_distP, max_distP)]
+        if count > 3:
+            pairs = count // 2 - 2
+            minmax_dists += zip(dist_state[1 : 1 + pairs], dist_state[-2 : -2 - pairs : -1])
+        minmaxW_dists = []
+        if countN >= 2:
+            pairs = max(countN // 2 - 2, 0)
+            minmaxW_dists += zip(
+                dist_stateN[1 : 1 + pairs], dist_stateN[-2 : -2 - pairs : -1]
+            )
+
+        min2_distP, max2_distP = (0, None), (0, None)
+        if count >= 4:
+            min2_distP = dist_state[1]
+            max2_distP = dist_state[-2]
+        if count == 3:
+            min2_distP = max_distP
+            max2_distP = dist_state[1]
+
+        return {
+            "mean": sum_dist / count if count else 0,
+            "sum2": sum_dist2,
+            "sumN": sum_distN,
+            "sumEu": sum_distEu,
+            "min": min_distP,
+            "min2": min2_distP,
+            "max": max_distP,
+            "max2": max2_distP,
+            "minmax": minmax_dists,
+            "minmaxW": minmaxW_dists,
+            "meanN": sum_distN / countN if countN else 0,
+            "maxN": max_distN,
+        }
+
     def calculate_distCP(self, state) -> dict:
         # Calculo de distancias a puntos relevantes ( CC, CN, P )
-        dist_CC = self.Manhattan(state.getPosition(), self.posCC)
-        dist_CN = self.Manhattan(state.getPosition(), self.posCN)
-        dist_parking = self.Manhattan(state.getPosition(), self.parking)
+        dist_CC = self.dist(state.getPosition(), self.posCC)
+        dist_CN = self.dist(state.getPosition(), self.posCN)
+        dist_parking = self.dist(state.getPosition(), self.parking)
         mean_distC = (dist_CC + dist_CN) / 2
 
         return {"CC": dist_CC, "CN": dist_CN, "P": dist_parking, "meanC": mean_distC}
@@ -478,16 +912,16 @@ class Map:
         if dist_metrics["max"][1]:
             # Calculo de la distancia entre el mas cercnao y el mas lejano
             if dist_metrics["min"][1]:
-                dist_minmax = self.Manhattan(
+                dist_minmax = self.dist(
                     dist_metrics["max"][1], dist_metrics["min"][1]
                 )
 
             # Calculo de distancia del mas lejano al centro
             x, y = dist_metrics["max"][1]
             center = self.posCN
-            if state.map[x][y] == "C":
+            if self.cell_code(state, (x, y)) == CELL_C:
                 center = self.posCC
-            dist_PC = self.Manhattan(dist_metrics["max"][1], center)
+            dist_PC = self.dist(dist_metrics["max"][1], center)
 
         return (
             dist_metrics["min"][0] * 1.25
@@ -511,14 +945,14 @@ class Map:
             if dist_metrics["min"][1]:
                 # Calculo de la distancia entre el mas cercano y el mas lejano (min y max) iterativo
                 for pair in dist_metrics["minmax"]:
-                    dist_minmax += self.Manhattan(pair[0][1], pair[1][1])
+                    dist_minmax += self.dist(pair[0][1], pair[1][1])
 
                 # Calculo de distancia del mas lejano al centro
                 x, y = dist_metrics["max"][1]
                 center = self.posCN
-                if state.map[x][y] == "C":
+                if self.cell_code(state, (x, y)) == CELL_C:
                     center = self.posCC
-                dist_PC = self.Manhattan(dist_metrics["max"][1], center)
+                dist_PC = self.dist(dist_metrics["max"][1], center)
 
         return (
             dist_metrics["min"][0] * DEFAULT_WEIGHT
@@ -526,7 +960,7 @@ class Map:
             + dist_PC * DEFAULT_WEIGHT
             + distCP_metrics["P"]
             * DEFAULT_WEIGHT
-            * HEURISTIC_ESCALE
+            * self.heuristic_escale
             * self.escales["PARKING_ESCALE"]
             + self.heuristic1(state)
         )
@@ -545,15 +979,15 @@ class Map:
             if dist_metrics["min"][1]:
                 # Calculo de la distancia entre el mas cercnao y el mas lejano
                 if dist_metrics["min"][1]:
-                    dist_minmax = self.Manhattan(
+                    dist_minmax = self.dist(
                         dist_metrics["max"][1], dist_metrics["min"][1]
                     )
                 # Calculo de distancia del mas lejano al centro
                 x, y = dist_metrics["max"][1]
                 center = self.posCN
-                if state.map[x][y] == "C":
+                if self.cell_code(state, (x, y)) == CELL_C:
                     center = self.posCC
-                dist_PC = self.Manhattan(dist_metrics["max"][1], center)
+                dist_PC = self.dist(dist_metrics["max"][1], center)
 
         return (
             dist_metrics["min"][0] * DEFAULT_WEIGHT
@@ -563,12 +997,96 @@ class Map:
             + (  # Heuristica parking y energia
                 distCP_metrics["P"]
                 * DEFAULT_WEIGHT
-                * HEURISTIC_ESCALE
+                * self.heuristic_escale
                 * self.escales["PARKING_ESCALE"]
             )
             + self.heuristic1(state)
         )
 
+    def build_pattern_databases(self, size: int = None, path: str = PDB_PATH) -> list:
+        """
+        Divide los pacientes, en el orden de sus bits, en patrones de size (por defecto el mayor cuya tabla
+        cabe en PDB_MAX_ENTRIES para este mapa) y proyecta la tabla de cada uno desde path (None las calcula
+        en memoria). Si no hay pacientes se usa un patron vacio (distancia exacta al parking)
+        """
+        if size is None:
+            size = pattern_size(self.rows * self.columns)
+        patients = [("N", pos) for pos in self.posN] + [("C", pos) for pos in self.posC]
+        starts = range(0, len(patients), size) if patients else [0]
+        return [
+            PatternDatabase(self, start, patients[start : start + size], path)
+            for start in starts
+        ]
+
+    def heuristic_pdb(self, state: State):
+        """
+        Maximo de las bases de datos de patrones. Cada una es el coste exacto de una abstraccion del
+        problema, por lo que la heuristica es admisible y consistente sin escalas por mapa
+        """
+        ambulance = state.ambulance
+        onboardN = ambulance.PN + ambulance.PCN
+        return self.heuristic_escale * max(
+            database.lookup(ambulance.pos, state.picked, onboardN, ambulance.PCC)
+            for database in self.pattern_databases
+        )
+
+    def move_cost(self, position: Tuple[int, int]) -> int:
+        """
+        Coste de entrar en la casilla segun el mapa base
+        """
+        return self.costs[position[0] * self.columns + position[1]]
+
+    def dijkstra(self, target: Tuple[int, int]) -> list:
+        """
+        Calcula con Dijkstra el coste minimo desde cada casilla hasta target, respetando muros y
+        casillas de coste 2. Devuelve una lista plana indexada por x * columns + y (inf si no hay camino)
+        """
+        columns = self.columns
+        dist = [math.inf] * (self.rows * columns)
+        dist[target[0] * columns + target[1]] = 0
+        heap = [(0, target)]
+        while heap:
+            d, position = heapq.heappop(heap)
+            x, y = position
+            if d > dist[x * columns + y]:
+                continue
+            # Ir desde un vecino hasta aqui cuesta entrar en esta casilla
+            step = d + self.move_cost(position)
+            for dx, dy in self.movements:
+                neighbour = (x + dx, y + dy)
+                if self.is_valid(neighbour):
+                    index = neighbour[0] * columns + neighbour[1]
+                    if step < dist[index]:
+                        dist[index] = step
+                        heapq.heappush(heap, (step, neighbour))
+        return dist
+
+    def calculate_distance_fields(self) -> dict:
+        """
+        Precalcula un campo de distancias por cada punto de interes (pacientes, CC, CN, parking y recargas)
+        """
+        return {poi: self.dijkstra(poi) for poi in self.points_of_interest()}
+
+    def points_of_interest(self) -> list:
+        """
+        Pacientes, CC, CN, parking y recargas sin repetidos, en el orden en el que se guardan sus campos
+        """
+        return list(
+            dict.fromkeys(
+                self.posN + self.posC + [self.posCC, self.posCN, self.parking] + self.recharges
+            )
+        )
+
+    def distance(self, origin: Tuple[int, int], target: Tuple[int, int]) -> float:
+        """
+        Coste real del camino mas corto de origin a target, consultado en O(1) en los campos precalculados.
+        Uno de los dos extremos debe ser un punto de interes
+        """
+        field = self.distance_fields.get(target)
+        if field is None:
+            field, origin = self.distance_fields[origin], target
+        return field[origin[0] * self.columns + origin[1]]
+
     def Manhattan(self, punto1, punto2):
         # Calcula la distancia euclidiana entre dos puntos
         return math.sqrt((punto1[0] - punto2[0]) ** 2 + (punto1[1] - punto2[1]) ** 2)
@@ -588,8 +1106,8 @@ class Map:
 
     def mean_Manhattan(self):
         # Calcula las distancias y guarda en listas separadas
-        distsN = [self.Manhattan(posN, self.posCN) for posN in self.posN]
-        distsC = [self.Manhattan(posC, self.posCC) for posC in self.posC]
+        distsN = [self.dist(posN, self.posCN) for posN in self.posN]
+        distsC = [self.dist(posC, self.posCC) for posC in self.posC]
 
         # Calcula la media de las distancias
         meanN = sum(distsN) / len(distsN) if distsN else 0
@@ -597,8 +1115,35 @@ class Map:
 
         return (meanC + meanN) / 2
 
-    def copyMap(self, state: State) -> None:
-        state.map = self.map.copy()
+    def cell(self, state: State, position: Tuple[int, int]):
+        """
+        Devuelve el contenido de la casilla vista desde el estado: el mapa base es inmutable y los
+        pacientes ya recogidos por el estado se leen como casillas de coste por defecto
+        """
+        bit = self.patient_bits.get(position)
+        if bit and state.picked & bit:
+            return DEFAULT_COST
+        return self.map[position[0]][position[1]]
+
+    def cell_code(self, state: State, position: Tuple[int, int]) -> int:
+        """
+        Codigo de la casilla vista desde el estado, como cell pero sobre la rejilla compacta
+        """
+        code = self.cells[position[0] * self.columns + position[1]]
+        if (code == CELL_N or code == CELL_C) and state.picked & self.patient_bits[
+            position
+        ]:
+            return CELL_ROAD
+        return code
+
+    def stateMap(self, state: State) -> list:
+        """
+        Construye el mapa completo tal y como lo ve el estado (solo para mostrarlo por pantalla)
+        """
+        return [
+            [self.cell(state, (i, j)) for j in range(self.columns)]
+            for i in range(self.rows)
+        ]
 
 
 def main():
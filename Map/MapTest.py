@@ -0,0 +1,113 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# Los modulos del proyecto se importan desde la raiz del repositorio, no desde el directorio del test
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[0] = ROOT_PATH
+
+from Map.Map import Map, np
+
+TEST_MAPS = ["ASTAR-test/easy.csv", "ASTAR-test/medium.csv", "ASTAR-test/medium3.csv"]
+TEST_STATES = 2000  # Estados expandidos por mapa
+
+
+def print_colored(message, color):
+    colors = {
+        "reset": "\033[0m",
+        "green": "\033[32m",
+        "red": "\033[31m",
+    }
+    print(f"{colors[color]}{message}{colors['reset']}")
+
+
+def run_test(test_function, test_name):
+    try:
+        test_function()
+        print_colored(f"{test_name} passed", "green")
+    except AssertionError:
+        print_colored(f"{test_name} failed", "red")
+
+
+def expanded_states(map: Map, limit: int = TEST_STATES) -> list:
+    """
+    Estados alcanzables desde el inicial en orden de anchura, sin repetidos
+    """
+    states = [map.getInitialState()]
+    seen = {states[0].key()}
+    for state in states:
+        if len(states) >= limit:
+            break
+        for successor in map.expand(state):
+            if successor.key() not in seen:
+                seen.add(successor.key())
+                states.append(successor)
+    return states[:limit]
+
+
+def map_data(map: Map) -> dict:
+    """
+    Datos precalculados del mapa que guarda la cache en disco
+    """
+    return {
+        "cells": bytes(map.cells),
+        "costs": bytes(map.costs),
+        "pois": (map.posN, map.posC, map.parking, map.posCC, map.posCN, map.recharges),
+        "fields": {poi: list(field) for poi, field in map.distance_fields.items()},
+        "escales": map.escales,
+        "mean": map.mean,
+    }
+
+
+def test_distp_numpy():
+    # La version vectorizada devuelve exactamente las mismas metricas que la de Python
+    if np is None:
+        print("NumPy no esta instalado: se omite la comparacion")
+        return
+    for file_name in TEST_MAPS:
+        for distances in ["euclidean", "exact"]:
+            map = Map(os.path.join(ROOT_PATH, file_name), 5, distances, distp="numpy", cache_path=None)
+            for state in expanded_states(map):
+                assert Map.calculate_distP(map, state) == map.calculate_distP_numpy(state)
+
+
+def test_drive_without_descent():
+    # Si ningun vecino baja por el campo de distancias drive no devuelve un camino inventado
+    map = Map(os.path.join(ROOT_PATH, TEST_MAPS[0]), 5, cache_path=None)
+    state = map.getInitialState()
+    target = map.posCN
+    assert map.drive(state, target) is not None
+    field = [map.rows * map.columns] * (map.rows * map.columns)
+    field[target[0] * map.columns + target[1]] = 0
+    map.distance_fields[target] = field
+    assert map.drive(state, target) is None
+
+
+def test_map_cache():
+    # La carga desde la cache (caliente) devuelve los mismos datos que la que los calcula (fria), y
+    # editar el CSV invalida su entrada
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, "map.csv")
+        cache_path = os.path.join(directory, "cache")
+        shutil.copy(os.path.join(ROOT_PATH, TEST_MAPS[0]), file_name)
+        cold = Map(file_name, 5, "exact", cache_path=cache_path)
+        warm = Map(file_name, 5, "exact", cache_path=cache_path)
+        assert warm.map_cache.buffer is not None
+        assert map_data(warm) == map_data(cold)
+        assert map_data(warm) == map_data(Map(file_name, 5, "exact", cache_path=None))
+
+        with open(file_name) as file:
+            contents = file.read()
+        with open(file_name, "w") as file:
+            file.write(contents.replace("1", "2", 1))
+        changed = Map(file_name, 5, "exact", cache_path=cache_path)
+        assert changed.map_cache.key != cold.map_cache.key
+        assert map_data(changed) != map_data(cold)
+        assert map_data(changed) == map_data(Map(file_name, 5, "exact", cache_path=None))
+
+
+if __name__ == "__main__":
+    run_test(test_distp_numpy, "Test distP numpy")
+    run_test(test_drive_without_descent, "Test drive sin camino")
+    run_test(test_map_cache, "Test cache de mapas")
@@ -0,0 +1,273 @@
+from Map.Map import Map
+from State.State import State
+import heapq
+import itertools
+import math
+import multiprocessing
+import queue
+
+"""
+En este archivo se define HDA*, la version paralela de A* que reparte los estados entre procesos
+"""
+
+HDA_WORKERS = 2  # Procesos de busqueda por defecto
+HDA_BATCH = 32  # Expansiones de cada proceso entre dos lecturas de su buzon
+HDA_POLL = 0.5  # Segundos entre dos comprobaciones de que los procesos siguen vivos
+HDA_JOIN_TIMEOUT = 5  # Segundos que se espera a que un proceso termine antes de forzar su parada
+
+
+def owner(key: tuple, workers: int) -> int:
+    """
+    Proceso propietario de un estado. El hash de una tupla de enteros es el mismo en todos los procesos
+    """
+    return hash(key) % workers
+
+
+class Shard:
+    """
+    Parte de la busqueda que pertenece a un proceso: sus abiertos, sus cerrados y, para cada estado,
+    el mejor g, su h, la clave del padre y la accion que lo genero
+    """
+
+    def __init__(self, map: Map, index: int, workers: int) -> None:
+        self.map = map
+        self.index = index
+        self.workers = workers
+        self.nodes = {}
+        self.closed = set()
+        self.open_set = []
+        self.counter = itertools.count()
+        self.goal_g, self.goal_key = math.inf, None
+        self.expanded = 0
+
+    def receive(self, messages: list) -> None:
+        """
+        Inserta los sucesores recibidos que mejoran el g conocido (reabriendo los cerrados)
+        """
+        for key, g, h, parent, action in messages:
+            node = self.nodes.get(key)
+            if node is not None and node[0] <= g:
+                continue
+            self.nodes[key] = (g, h, parent, action)
+            self.closed.discard(key)
+            heapq.heappush(self.open_set, (g + h, next(self.counter), key))
+
+    def min_f(self) -> float:
+        """
+        Menor f de los abiertos, descartando las entradas obsoletas de la cima del monticulo
+        """
+        open_set = self.open_set
+        while open_set:
+            f, _, key = open_set[0]
+            g, h = self.nodes[key][:2]
+            if key not in self.closed and f == g + h:
+                return f
+            heapq.heappop(open_set)
+        return math.inf
+
+    def expand(self, bound: float, batch: int) -> list:
+        """
+        Expande hasta batch nodos con f menor que bound (el coste de la mejor solucion conocida) y
+        devuelve los sucesores de otros procesos agrupados por propietario. Los propios se insertan
+        directamente y los que no pueden mejorar bound se descartan
+        """
+        outgoing = [[] for _ in range(self.workers)]
+        final_state = self.map.getFinalState()
+        actions = self.map.actions
+        for _ in range(batch):
+            bound = min(bound, self.goal_g)
+            f = self.min_f()
+            if f >= bound:
+                break
+            _, _, key = heapq.heappop(self.open_set)
+            self.closed.add(key)
+            g, h = self.nodes[key][:2]
+            state = State.from_key(key)
+            state.g, state.h, state.f = g, h, f
+            if state.equal_goal(final_state):
+                if g < self.goal_g:
+                    self.goal_g, self.goal_key = g, key
+                continue
+
+            self.expanded += 1
+            x, y = key[0]
+            for successor in self.map.expand(state):
+                if successor.g + successor.h >= bound:
+                    continue
+                successor_key = successor.key()
+                position = successor_key[0]
+                message = (
+                    successor_key,
+                    successor.g,
+                    successor.h,
+                    key,
+                    actions[(position[0] - x, position[1] - y)],
+                )
+                target = owner(successor_key, self.workers)
+                if target == self.index:
+                    self.receive([message])
+                else:
+                    outgoing[target].append(message)
+        return outgoing
+
+
+def worker(
+    index: int,
+    map_args: tuple,
+    workers: int,
+    batch: int,
+    inboxes: list,
+    results,
+    in_transit,
+    done,
+    bound,
+) -> None:
+    """
+    Proceso de HDA* asincrono: mientras tenga abiertos con f menor que la mejor solucion (bound,
+    compartida) lee su buzon, expande un lote y envia los sucesores directamente al buzon de su
+    propietario. in_transit cuenta los lotes enviados que su destinatario aun no ha terminado de
+    procesar: cada proceso los descuenta al quedarse sin trabajo, despues de enviar los lotes que han
+    generado, por lo que cuando llega a cero no queda trabajo en ningun proceso y se avisa con done.
+    Despues responde a las consultas del padre de un estado para reconstruir el camino
+    """
+    shard = Shard(Map(*map_args), index, workers)
+    inbox = inboxes[index]
+    received = sent = 0
+    while True:
+        working = shard.min_f() < min(bound.value, shard.goal_g)
+        if not working and received:
+            with in_transit.get_lock():
+                in_transit.value -= received
+                if in_transit.value == 0:
+                    done.set()
+            received = 0
+        try:
+            message = inbox.get(block=not working)
+        except queue.Empty:
+            message = None
+
+        if message is None:
+            # Buzon vacio: expande un lote y reparte los sucesores
+            outgoing = shard.expand(bound.value, batch)
+            if shard.goal_g < bound.value:
+                with bound.get_lock():
+                    bound.value = min(bound.value, shard.goal_g)
+            for target, messages in enumerate(outgoing):
+                if messages:
+                    with in_transit.get_lock():
+                        in_transit.value += 1
+                    inboxes[target].put(("nodes", messages))
+                    sent += 1
+        elif message[0] == "nodes":
+            shard.receive(message[1])
+            received += 1
+        elif message[0] == "result":
+            results.put(
+                (index, shard.goal_g, shard.goal_key, shard.expanded, len(shard.nodes), sent)
+            )
+        elif message[0] == "parent":
+            node = shard.nodes[message[1]]
+            results.put((index, node[2], node[3]))
+        else:
+            return
+
+
+def check_workers(processes: list) -> None:
+    """
+    Lanza RuntimeError si algun proceso ha terminado, porque su trabajo pendiente no se completaria nunca
+    """
+    for i, process in enumerate(processes):
+        if not process.is_alive():
+            raise RuntimeError(f"El proceso {i} de HDA* ha terminado con codigo {process.exitcode}")
+
+
+def receive(results, processes: list) -> tuple:
+    """
+    Espera el siguiente resultado de los procesos comprobando periodicamente que siguen vivos
+    """
+    while True:
+        try:
+            return results.get(timeout=HDA_POLL)
+        except queue.Empty:
+            check_workers(processes)
+
+
+def hda_search(
+    map_args: tuple, initial_state: State, workers: int = HDA_WORKERS, batch: int = HDA_BATCH
+) -> tuple:
+    """
+    HDA*: reparte los estados por el hash de su clave entre workers procesos, cada uno con sus abiertos y
+    cerrados, que se envian los sucesores directamente y comparten el coste de la mejor solucion. Este
+    proceso solo reparte el estado inicial y espera a que no quede trabajo en ningun proceso; entonces
+    ninguno tiene abiertos con f menor que la mejor solucion, por lo que con una heuristica admisible la
+    solucion es optima.
+
+    Devuelve los codigos de accion del camino (None si no hay solucion), las expansiones y los nodos
+    guardados por cada proceso y el numero de lotes de sucesores intercambiados. Si un proceso termina
+    antes de tiempo lanza RuntimeError en lugar de esperar indefinidamente
+    """
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    # Lotes enviados pendientes de procesar (el primero es el del estado inicial), aviso de que ya no
+    # queda trabajo y coste de la mejor solucion encontrada
+    in_transit = context.Value("l", 1)
+    done = context.Event()
+    bound = context.Value("d", math.inf)
+    processes = [
+        context.Process(
+            target=worker,
+            args=(i, map_args, workers, batch, inboxes, results, in_transit, done, bound),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        initial_key = initial_state.key()
+        inboxes[owner(initial_key, workers)].put(
+            ("nodes", [(initial_key, initial_state.g, initial_state.h, None, None)])
+        )
+        while not done.wait(HDA_POLL):
+            check_workers(processes)
+
+        expanded = [0] * workers
+        stored = [0] * workers
+        goal_g, goal_key = math.inf, None
+        sent = 0
+        for inbox in inboxes:
+            inbox.put(("result",))
+        for _ in range(workers):
+            index, worker_goal_g, key, worker_expanded, nodes, worker_sent = receive(
+                results, processes
+            )
+            expanded[index], stored[index] = worker_expanded, nodes
+            sent += worker_sent
+            if worker_goal_g < goal_g:
+                goal_g, goal_key = worker_goal_g, key
+
+        if goal_key is None:
+            return None, expanded, stored, sent
+
+        # Reconstruye el camino preguntando a cada propietario por el padre del estado
+        path_actions = bytearray()
+        key = goal_key
+        while True:
+            inboxes[owner(key, workers)].put(("parent", key))
+            _, parent, action = receive(results, processes)
+            if parent is None:
+                break
+            path_actions.append(action)
+            key = parent
+        path_actions.reverse()
+        return path_actions, expanded, stored, sent
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        for process in processes:
+            process.join(HDA_JOIN_TIMEOUT)
+            if process.is_alive():
+                process.terminate()
+                process.join()
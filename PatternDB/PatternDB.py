@@ -0,0 +1,141 @@
+from array import array
+import hashlib
+import heapq
+import math
+import mmap
+import os
+
+"""
+En este archivo se define la base de datos de patrones (PDB) que usa la heuristica del modo 7
+"""
+
+PDB_PATH = "./pdb/"  # Directorio donde se guardan las tablas precalculadas
+PDB_PATTERN_SIZE = 8  # Pacientes por patron (cada tabla ocupa casillas * 2^K * 4 * 2 bytes)
+# Entradas maximas de cada tabla: en mapas grandes se usan patrones mas pequeños para no pasar de aqui
+PDB_MAX_ENTRIES = 1 << 21
+PDB_UNREACHABLE = 0xFFFF  # Valor de las entradas desde las que no se alcanza la meta
+
+
+def pattern_size(cells: int, max_entries: int = PDB_MAX_ENTRIES) -> int:
+    """
+    Mayor tamaño de patron (hasta PDB_PATTERN_SIZE) cuya tabla para un mapa de cells casillas no supera
+    max_entries. Si ni un patron de un paciente cabe, falla en lugar de pasar minutos calculando la tabla
+    """
+    size = PDB_PATTERN_SIZE
+    while size > 0 and cells << (size + 2) > max_entries:
+        size -= 1
+    if size == 0:
+        raise ValueError(
+            f"El mapa tiene {cells} casillas y las tablas de patrones del modo 7 superarian "
+            f"{max_entries} entradas: usa otro modo de heuristica"
+        )
+    return size
+
+
+class PatternDatabase:
+    """
+    Coste exacto hasta la meta en una abstraccion del problema que solo conserva la posicion de la
+    ambulancia, que pacientes del patron siguen esperando y si hay algun No Contagioso y algun Contagioso
+    a bordo. Se ignoran la energia, las plazas, el resto de pacientes y el orden de recogida, por lo que
+    toda transicion real tiene su transicion abstracta con el mismo coste y la heuristica es consistente.
+
+    Cada entrada se indexa por ((casilla << K) | esperando) << 2 | aN << 1 | aC y se guarda como uint16
+    """
+
+    def __init__(self, map, first_bit: int, patients: list, path: str = PDB_PATH) -> None:
+        self.map = map
+        # Bits de la mascara de recogidos que cubre el patron (consecutivos desde first_bit)
+        self.first_bit = first_bit
+        self.patients = patients
+        self.size = len(patients)
+        self.mask = (1 << self.size) - 1
+        # Sin path la tabla se calcula en memoria y no se guarda
+        self.file_name = os.path.join(path, self.table_name(map.map_hash)) if path else None
+        self.table = self.load()
+
+    def table_name(self, map_hash: str) -> str:
+        # El nombre depende del contenido del mapa y del patron, asi un cambio invalida la tabla
+        pattern = ";".join(f"{kind}{x},{y}" for kind, (x, y) in self.patients)
+        digest = hashlib.sha1(f"{map_hash}|{pattern}".encode()).hexdigest()[:16]
+        return f"{digest}.pdb"
+
+    def load(self) -> memoryview:
+        """
+        Proyecta la tabla en memoria, calculandola y guardandola antes si todavia no existe
+        """
+        if self.file_name is None:
+            return memoryview(self.build())
+        if not os.path.exists(self.file_name):
+            os.makedirs(os.path.dirname(self.file_name), exist_ok=True)
+            # Se escribe en un temporal y se renombra para que otros procesos no lean tablas a medias
+            temp_name = f"{self.file_name}.{os.getpid()}.tmp"
+            with open(temp_name, "wb") as file:
+                self.build().tofile(file)
+            os.replace(temp_name, self.file_name)
+
+        with open(self.file_name, "rb") as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self.buffer).cast("H")
+
+    def build(self) -> array:
+        """
+        Busqueda hacia atras (Dijkstra) desde la meta abstracta: ambulancia en el parking, ningun
+        paciente del patron esperando y nadie a bordo
+        """
+        map, size = self.map, self.size
+        columns = map.columns
+        table = array("H", [PDB_UNREACHABLE]) * (map.rows * columns << (size + 2))
+
+        # Bit y tipo del paciente del patron en cada casilla
+        patient_at = {pos: (1 << i, kind) for i, (kind, pos) in enumerate(self.patients)}
+
+        goal = (map.parking[0] * columns + map.parking[1]) << (size + 2)
+        table[goal] = 0
+        heap = [(0, goal)]
+        while heap:
+            d, index = heapq.heappop(heap)
+            if d > table[index]:
+                continue
+            cell = index >> (size + 2)
+            waiting = (index >> 2) & self.mask
+            onboardN, onboardC = (index >> 1) & 1, index & 1
+            position = divmod(cell, columns)
+
+            # Estados abstractos que, al entrar en position, producen el estado actual
+            predecessors = [(waiting, onboardN, onboardC)]
+            if position == map.posCN:
+                predecessors = [(waiting, 0, onboardC), (waiting, 1, onboardC)] if not onboardN else []
+            elif position == map.posCC:
+                predecessors = [(waiting, onboardN, 0), (waiting, onboardN, 1)] if not onboardC else []
+            elif position in patient_at:
+                bit, kind = patient_at[position]
+                # Recogida opcional: en el problema real puede fallar por falta de plazas
+                if not waiting & bit:
+                    if kind == "N" and onboardN:
+                        predecessors += [(waiting | bit, 0, onboardC), (waiting | bit, 1, onboardC)]
+                    elif kind == "C" and onboardC:
+                        predecessors += [(waiting | bit, onboardN, 0), (waiting | bit, onboardN, 1)]
+
+            step = min(d + map.move_cost(position), PDB_UNREACHABLE - 1)
+            for dx, dy in map.movements:
+                neighbour = (position[0] + dx, position[1] + dy)
+                if not map.is_valid(neighbour):
+                    continue
+                base = (neighbour[0] * columns + neighbour[1]) << (size + 2)
+                for previous, previousN, previousC in predecessors:
+                    previous_index = base | previous << 2 | previousN << 1 | previousC
+                    if step < table[previous_index]:
+                        table[previous_index] = step
+                        heapq.heappush(heap, (step, previous_index))
+        return table
+
+    def lookup(self, position, picked: int, onboardN: bool, onboardC: bool) -> float:
+        """
+        Coste abstracto hasta la meta para el estado real (inf si no se puede alcanzar)
+        """
+        waiting = ~picked >> self.first_bit & self.mask
+        cell = position[0] * self.map.columns + position[1]
+        value = self.table[
+            cell << (self.size + 2) | waiting << 2 | bool(onboardN) << 1 | bool(onboardC)
+        ]
+        return math.inf if value == PDB_UNREACHABLE else value
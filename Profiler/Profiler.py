@@ -0,0 +1,46 @@
+import time
+
+"""
+En este archivo se define el perfilador que usa el modo --profile para medir cada fase de la busqueda
+"""
+
+
+class Profiler:
+    """Acumula el tiempo de cada fase y los contadores de la busqueda"""
+
+    def __init__(self) -> None:
+        self.times = {}
+        self.counters = {}
+
+    def reset(self) -> None:
+        """
+        Pone a cero los tiempos y los contadores. Los envoltorios ya creados siguen sumando en los mismos
+        diccionarios
+        """
+        for phase in self.times:
+            self.times[phase] = 0.0
+        self.counters.clear()
+
+    def timed(self, phase: str, function, counter: str = None):
+        """
+        Devuelve function envuelta para que sume su tiempo de ejecucion (inclusivo) a la fase indicada y,
+        si se indica counter, la longitud de su resultado a ese contador. Solo se envuelven las funciones
+        cuando el perfilado esta activo, por lo que sin --profile no hay coste
+        """
+        times = self.times
+        times.setdefault(phase, 0.0)
+        counters = self.counters
+        perf_counter = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                result = function(*args, **kwargs)
+                if counter is not None:
+                    counters[counter] = counters.get(counter, 0) + len(result)
+                return result
+            finally:
+                times[phase] += perf_counter() - start
+
+        wrapper.__name__ = function.__name__
+        return wrapper
@@ -0,0 +1,149 @@
+from ASTARTraslados import *
+from concurrent.futures import ProcessPoolExecutor
+
+"""
+En este archivo se define la API para resolver mapas desde Python, sin la linea de comandos y sin
+escribir ficheros
+"""
+
+# Opciones de solve y sus valores por defecto. Sin cache en disco ni tablas de patrones guardadas, por
+# lo que solo se lee el CSV cuando el mapa se indica por su ruta
+SOLVE_OPTIONS = {
+    "engine": ENGINE,
+    "distances": DISTANCES,
+    "cache_size": HEURISTIC_CACHE_SIZE,
+    "distp": DISTP,
+    "tuning": FILE,
+    "cache_path": None,
+    "pdb_path": None,
+    "node_budget": NODE_BUDGET,
+    "epsilon": ARA_EPSILON,
+    "epsilon_step": ARA_EPSILON_STEP,
+    "beam_width": BEAM_WIDTH,
+    "focal_weight": FOCAL_WEIGHT,
+    "dominance": DOMINANCE,
+    "workers": HDA_WORKERS,
+}
+# Opciones que son atributos del buscador (el resto son argumentos del mapa)
+SEARCH_OPTIONS = [
+    "engine",
+    "node_budget",
+    "epsilon",
+    "epsilon_step",
+    "beam_width",
+    "focal_weight",
+    "dominance",
+    "workers",
+]
+
+
+class Result:
+    """
+    Resultado de solve: el plan (estados desde el inicial hasta la meta, vacio si no hay solucion), su
+    coste, sus lineas en el formato del .output y las estadisticas de la busqueda (los datos del .stat)
+    """
+
+    def __init__(self, plan: list, lines: list, stats: dict) -> None:
+        self.plan = plan
+        self.lines = lines
+        self.stats = stats
+        self.cost = plan[-1].g if plan else None
+
+    @property
+    def solved(self) -> bool:
+        return bool(self.plan)
+
+    def __repr__(self) -> str:
+        return f"Result(cost={self.cost}, len_path={len(self.plan)}, expanded={self.stats['Nodos expandidos']})"
+
+
+def solve_options(options: dict = None) -> dict:
+    """
+    Completa las opciones con los valores por defecto y rechaza las desconocidas
+    """
+    options = options or {}
+    unknown = set(options) - set(SOLVE_OPTIONS)
+    if unknown:
+        raise ValueError(f"Opciones desconocidas: {', '.join(sorted(unknown))}")
+    if options.get("engine", ENGINE) not in ENGINES:
+        raise ValueError(f"Motor de busqueda desconocido '{options['engine']}'")
+    return SOLVE_OPTIONS | options
+
+
+def load_map(map_source, mode: int = 0, options: dict = None) -> Map:
+    """
+    Construye el mapa de map_source: un Map ya preparado (se devuelve tal cual), el contenido de un CSV
+    (cualquier texto con ';' o saltos de linea) o la ruta de un CSV. Lanza ValueError si el formato del
+    mapa no es valido
+    """
+    if isinstance(map_source, Map):
+        return map_source
+    options = solve_options(options)
+    arguments = (
+        mode,
+        options["distances"],
+        options["cache_size"],
+        options["distp"],
+    )
+    if "\n" in map_source or ";" in map_source:
+        return Map.from_string(map_source, *arguments, options["tuning"])
+    return Map(
+        map_source,
+        *arguments,
+        options["cache_path"],
+        options["tuning"],
+        None,
+        options["pdb_path"],
+    )
+
+
+def solve(map_source, mode: int = 0, options: dict = None) -> Result:
+    """
+    Resuelve un mapa en el proceso actual. map_source puede ser la ruta de un CSV, su contenido o un Map
+    ya preparado (en ese caso se usa su modo y mode se ignora). Reutilizar el mismo Map entre llamadas
+    conserva sus campos de distancia, escalas y cache de heuristica
+    """
+    options = solve_options(options)
+    map = load_map(map_source, mode, options)
+    astar_traslados = ASTARTraslados(None, map=map)
+    for name in SEARCH_OPTIONS:
+        setattr(astar_traslados, name, options[name])
+
+    inicio_tiempo = time.time()
+    resultado = astar_traslados.search()
+    total_time = time.time() - inicio_tiempo
+
+    rescale(resultado, map.heuristic_escale)
+    cost = resultado[-1].g if resultado else None
+    stats = astar_traslados.info(
+        total_time, cost, len(resultado), astar_traslados.expanded
+    )
+    return Result(resultado, astar_traslados.solution_lines(resultado), stats)
+
+
+def solve_many(
+    map_sources: list, mode: int = 0, options: dict = None, workers: int = 1
+) -> list:
+    """
+    Resuelve varios mapas y devuelve sus resultados en el mismo orden. Con workers=1 se resuelven en el
+    proceso actual y los mapas repetidos se preparan una sola vez; con mas procesos se reparten con un
+    ProcessPoolExecutor (entonces map_sources solo puede contener rutas o contenidos de CSV)
+    """
+    options = solve_options(options)
+    if workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(solve, map_source, mode, options)
+                for map_source in map_sources
+            ]
+            return [future.result() for future in futures]
+
+    maps = {}
+    results = []
+    for map_source in map_sources:
+        if not isinstance(map_source, Map):
+            if map_source not in maps:
+                maps[map_source] = load_map(map_source, mode, options)
+            map_source = maps[map_source]
+        results.append(solve(map_source, mode, options))
+    return results
@@ -0,0 +1,99 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+# Los modulos del proyecto se importan desde la raiz del repositorio, no desde el directorio del test
+ROOT_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[0] = ROOT_PATH
+
+from Solver.Solver import *
+
+# Mapas de prueba y coste optimo en el modo 3
+TEST_MAPS = {
+    os.path.join(ROOT_PATH, "ASTAR-test/easy.csv"): 29,
+    os.path.join(ROOT_PATH, "ASTAR-test/medium.csv"): 33,
+}
+TEST_MODE = 3
+
+
+def print_colored(message, color):
+    colors = {
+        "reset": "\033[0m",
+        "green": "\033[32m",
+        "red": "\033[31m",
+    }
+    print(f"{colors[color]}{message}{colors['reset']}")
+
+
+def run_test(test_function, test_name):
+    try:
+        test_function()
+        print_colored(f"{test_name} passed", "green")
+    except AssertionError:
+        print_colored(f"{test_name} failed", "red")
+
+
+def test_solve_sources():
+    # La ruta, el contenido del CSV y un Map ya preparado dan el coste optimo
+    for file_name, optimal in TEST_MAPS.items():
+        with open(file_name, "r") as archivo:
+            contents = archivo.read()
+        map = load_map(file_name, TEST_MODE)
+        for map_source in [file_name, contents, map]:
+            result = solve(map_source, TEST_MODE)
+            assert result.solved and result.cost == optimal
+            assert len(result.lines) == len(result.plan)
+
+
+def test_solve_many():
+    # En el proceso actual y repartido entre procesos los resultados son los mismos
+    map_sources = list(TEST_MAPS) * 2
+    sequential = solve_many(map_sources, TEST_MODE)
+    parallel = solve_many(map_sources, TEST_MODE, workers=2)
+    assert [result.cost for result in sequential] == list(TEST_MAPS.values()) * 2
+    assert [result.cost for result in parallel] == [result.cost for result in sequential]
+    assert [result.lines for result in parallel] == [result.lines for result in sequential]
+
+
+def test_invalid_map():
+    # Un mapa con formato no valido lanza ValueError sin escribir por consola y no se escribe ningun fichero
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for map_source in ["X;Y;Z\n", os.path.join(ROOT_PATH, "ASTAR-test/error.csv")]:
+                output = io.StringIO()
+                try:
+                    with contextlib.redirect_stdout(output):
+                        solve(map_source, TEST_MODE)
+                except ValueError:
+                    pass
+                else:
+                    assert False
+                assert output.getvalue() == ""
+            solve(next(iter(TEST_MAPS)), TEST_MODE)
+            assert os.listdir(directory) == []
+        finally:
+            os.chdir(working_directory)
+
+
+def test_stats_per_request():
+    # Con un Map reutilizado las estadisticas de la cache son las de cada busqueda, no las acumuladas
+    map = load_map(next(iter(TEST_MAPS)), 5)
+    first = solve(map).stats
+    second = solve(map).stats
+    assert first["Cache heuristica fallos"] > 0
+    assert second["Cache heuristica fallos"] == 0
+    assert (
+        second["Cache heuristica aciertos"]
+        == first["Cache heuristica aciertos"] + first["Cache heuristica fallos"]
+    )
+
+
+if __name__ == "__main__":
+    run_test(test_solve_sources, "Test solve")
+    run_test(test_solve_many, "Test solve_many")
+    run_test(test_invalid_map, "Test mapa no valido")
+    run_test(test_stats_per_request, "Test estadisticas por peticion")
@@ -16,6 +16,9 @@ DEFAULT_COST = 1
 class Ambulance:
     """Esta clase representa la ambulacancia"""
 
+    # Sin diccionario por instancia: cada sucesor copia solo estos campos enteros
+    __slots__ = ("capacityN", "capacityC", "PN", "PCN", "PCC", "energy", "pos")
+
     def __init__(
         self,
         capacityN: int = CAPACITY_N,
@@ -27,23 +30,34 @@ class Ambulance:
         self.capacityN = capacityN
         self.capacityC = capacityC
 
-        # Asignación de plazas
+        # Asignación de plazas: PN zona No Contagiosos, PCN/PCC No Contagiosos y Contagiosos en la zona de Contagiosos
         self.PN = 0
-        self.PC = {"N": 0, "C": 0}
+        self.PCN = 0
+        self.PCC = 0
 
         # Energía y posición
         self.energy = energy
         self.pos = pos
 
+    @property
+    def PC(self) -> dict:
+        """Ocupacion de la zona de Contagiosos en el formato {"N": n, "C": c}"""
+        return {"N": self.PCN, "C": self.PCC}
+
+    @PC.setter
+    def PC(self, value: dict) -> None:
+        self.PCN = value["N"]
+        self.PCC = value["C"]
+
     def __copy__(self):
-        new_instance = type(self)(
-            capacityN=self.capacityN,
-            capacityC=self.capacityC,
-            energy=self.energy,
-            pos=copy.copy(self.pos),
-        )
+        new_instance = Ambulance.__new__(Ambulance)
+        new_instance.capacityN = self.capacityN
+        new_instance.capacityC = self.capacityC
         new_instance.PN = self.PN
-        new_instance.PC = self.PC.copy()
+        new_instance.PCN = self.PCN
+        new_instance.PCC = self.PCC
+        new_instance.energy = self.energy
+        new_instance.pos = self.pos
 
         return new_instance
 
@@ -53,9 +67,8 @@ class Ambulance:
         # Contagioso
         if type == "C":
             # Hay hueco en Contagiosos y no hay ningún No Contagioso
-            count = sum(self.PC[key] for key in self.PC.keys())
-            if count < self.capacityC and self.PC["N"] == 0:
-                self.PC[type] += 1
+            if self.PCN + self.PCC < self.capacityC and self.PCN == 0:
+                self.PCC += 1
                 return True
 
         # No contagioso
@@ -66,9 +79,8 @@ class Ambulance:
                 return True
 
             # Hay hueco en Contagiosos y no hay ningún Contagioso
-            count = sum(self.PC[key] for key in self.PC.keys())
-            if count < self.capacityC and self.PC["C"] == 0:
-                self.PC[type] += 1
+            if self.PCN + self.PCC < self.capacityC and self.PCC == 0:
+                self.PCN += 1
                 return True
 
         return False
@@ -94,19 +106,19 @@ class Ambulance:
         """
         Este metodo devuelve el numero de Contagiados en la ambulancia, si habia alguno lo borra de la zona de contagiados
         """
-        count = self.PC["C"]
+        count = self.PCC
         if count > 0:
-            self.PC["C"] = 0
+            self.PCC = 0
         return count
 
     def leaveNotContagious(self) -> None:
         """
         Este metodo devuelve el numero de No Contagiados en la ambulancia, si habia alguno lo borra de la zona de contagiados o zona de no contagiados
         """
-        countC = self.PC["N"]
+        countC = self.PCN
         countN = self.PN
         if countC > 0:
-            self.PC["N"] = 0
+            self.PCN = 0
         if countN > 0:
             self.PN = 0
         return countC + countN
@@ -116,13 +128,16 @@ class Ambulance:
 
 
 class State:
+    # El mapa vive en Map, el estado solo guarda la mascara de pacientes recogidos
+    __slots__ = ("ambulance", "CC", "CN", "f", "g", "h", "picked")
+
     def __init__(
         self,
         evaluation: int = 0,
         ambulance: Ambulance = Ambulance(),
         cc: int = 0,
         cn: int = 0,
-        map: List[List[int]] = [],
+        picked: int = 0,
     ):
         self.ambulance = ambulance
         self.CC = cc
@@ -131,47 +146,52 @@ class State:
         self.g = 0
         self.h = 0
 
-        self.map = map
-
-    def __eq__(self, __value: "State") -> bool:
-        """Comprueba que dos estados sean iguales haciendo uso del operador =="""
-
-        # La ambulancia no se encuentra en en el mismo lugar
-        if self.ambulance.pos != __value.ambulance.pos:
-            return False
-
-        # La ambulancia no tiene la misma energia
-        if self.ambulance.energy != __value.ambulance.energy:
-            return False
-
-        # Tienen distinto número de plazas asignadas en No Cantagiosos
-        if self.ambulance.PN != __value.ambulance.PN:
-            return False
+        # Mascara de bits con los pacientes ya recogidos (un bit por paciente, asignado por el mapa)
+        self.picked = picked
 
-        # Tienen distinta asignacion de la zona de Cantiogiosos
-        if (
-            self.ambulance.PC["N"] != __value.ambulance.PC["N"]
-            or self.ambulance.PC["C"] != __value.ambulance.PC["C"]
-        ):
-            return False
+    def key(self) -> tuple:
+        """
+        Devuelve la clave canonica y hashable del estado: posicion, energia, plazas ocupadas,
+        pacientes entregados en cada centro y pacientes recogidos
+        """
+        ambulance = self.ambulance
+        return (
+            ambulance.pos,
+            ambulance.energy,
+            ambulance.PN,
+            ambulance.PCN,
+            ambulance.PCC,
+            self.CC,
+            self.CN,
+            self.picked,
+        )
 
-        # No han llevado a los centros al mismo numero de pacientes
-        if self.CC != __value.CC or self.CN != __value.CN:
-            return False
+    @classmethod
+    def from_key(cls, key: tuple) -> "State":
+        """
+        Reconstruye el estado a partir de su clave canonica (f, g y h quedan a 0)
+        """
+        pos, energy, PN, PCN, PCC, CC, CN, picked = key
+        ambulance = Ambulance(energy=energy, pos=pos)
+        ambulance.PN, ambulance.PCN, ambulance.PCC = PN, PCN, PCC
+        return cls(ambulance=ambulance, cc=CC, cn=CN, picked=picked)
 
-        if self.map != __value.map:
-            return False
+    def __eq__(self, __value: "State") -> bool:
+        """Comprueba que dos estados sean iguales haciendo uso del operador =="""
+        return self.key() == __value.key()
 
-        return True
+    def __hash__(self) -> int:
+        return hash(self.key())
 
     def __copy__(self):
-        new_instance = type(self)(
-            evaluation=self.f,
-            ambulance=copy.copy(self.ambulance),
-            cc=self.CC,
-            cn=self.CN,
-            map=copy.deepcopy(self.map),
-        )
+        new_instance = State.__new__(State)
+        new_instance.ambulance = copy.copy(self.ambulance)
+        new_instance.CC = self.CC
+        new_instance.CN = self.CN
+        new_instance.f = self.f
+        new_instance.g = 0
+        new_instance.h = 0
+        new_instance.picked = self.picked
         return new_instance
 
     def __str__(self):
@@ -213,7 +233,7 @@ class State:
         """
         Devuelve el numero de pacientes No Contagiosos que ya han sido recogidos
         """
-        numN = self.ambulance.PC["N"]
+        numN = self.ambulance.PCN
         # Pacientes NC en el centro + Pacientes NC subidos en la ambulancia en zona NC + Pacientes NC subidos en zona C
         return self.CN + self.ambulance.PN + numN
 
@@ -222,7 +242,7 @@ class State:
         Devuelve el numero de pacientes Contagiosos que ya han sido recogidos
         """
         # Pacientes CC en el centro + Pacientes C subidos en zona C
-        return self.CC + self.ambulance.PC["C"]
+        return self.CC + self.ambulance.PCC
 
     def leaveContagious(self) -> None:
         """
@@ -236,7 +256,7 @@ class State:
         Este metodo traslada los pacientes NO Contagiados de la ambulancia al Centro de NO Contagiados
         """
         # Si no hay ningun contagiado subido ejecuta el operador, en caso contrario debe darles prioridad
-        if self.ambulance.PC["C"] == 0:
+        if self.ambulance.PCC == 0:
             count = self.ambulance.leaveNotContagious()
             self.CN += count
 
@@ -252,8 +272,8 @@ class State:
 
         # Tienen distinta asignacion de la zona de Cantiogiosos
         if (
-            self.ambulance.PC["N"] != __value.ambulance.PC["N"]
-            or self.ambulance.PC["C"] != __value.ambulance.PC["C"]
+            self.ambulance.PCN != __value.ambulance.PCN
+            or self.ambulance.PCC != __value.ambulance.PCC
         ):
             return False
 
@@ -263,12 +283,14 @@ class State:
 
         return True
 
-    def addPassenger(self, type: str, position: Tuple[int, int]) -> None:
+    def addPassenger(self, type: str, position: Tuple[int, int], bit: int = 0) -> None:
         """
-        Añade el pasajero a la ambulancia si es posible y actualiza el mapa en caso afirmativo
+        Añade el pasajero a la ambulancia si es posible y lo marca como recogido en caso afirmativo.
+        bit es el bit del paciente en position dentro de la mascara de recogidos; el mapa lee la
+        casilla como coste por defecto a partir de ese bit
         """
         if self.ambulance.addPassenger(type) == True:
-            self.map[position[0]][position[1]] = DEFAULT_COST
+            self.picked |= bit
 
     def bateryLevel(self) -> float:
         return self.ambulance.bateryLevel()
@@ -1,4 +1,4 @@
-from State import Ambulance
+from State import Ambulance, State
 
 PC = {"N": 0, "C": 1}
 PN = 1
@@ -86,6 +86,26 @@ def test_energy_methods():
     assert ambulance.energy == 40
 
 
+def test_state_key():
+    # Estados equivalentes comparten clave y hash aunque tengan distinta evaluacion
+    state1 = State(ambulance=Ambulance(pos=(1, 1)), evaluation=3)
+    state2 = State(ambulance=Ambulance(pos=(1, 1)), evaluation=7)
+    assert state1.key() == state2.key()
+    assert hash(state1) == hash(state2)
+    assert state1 == state2
+
+    # Recoger un paciente cambia la mascara de recogidos y por tanto la clave
+    state2.addPassenger("N", (1, 1), 1 << 3)
+    assert state2.picked == 1 << 3
+    assert state1.key() != state2.key()
+
+    # La clave basta para reconstruir el estado (la arena de A* solo guarda claves)
+    state2.ambulance.consumeEnergy(5)
+    rebuilt = State.from_key(state2.key())
+    assert rebuilt == state2
+    assert rebuilt.ambulance.energy == state2.ambulance.energy
+
+
 if __name__ == "__main__":
     run_test(test_case_1, "Test case 1")
     run_test(test_case_2, "Test case 2")
@@ -93,3 +113,4 @@ if __name__ == "__main__":
     run_test(test_case_4, "Test case 4")
     run_test(test_case_5, "Test case 5")
     run_test(test_energy_methods, "Test energy methods")
+    run_test(test_state_key, "Test state key")
@@ -0,0 +1,45 @@
+import json
+
+"""
+En este archivo se define el flujo de eventos de la busqueda que escribe el modo --trace
+"""
+
+TRACE_SAMPLE = 1  # Se guarda una de cada TRACE_SAMPLE expansiones
+TRACE_BUFFER = 1 << 20  # Bytes del buffer de escritura del fichero de traza
+
+
+class SearchTrace:
+    """
+    Escribe una linea JSON por expansion muestreada: identificador de expansion, f/g/h, posicion, energia,
+    carga de la ambulancia, pacientes entregados y tamaño de la frontera. El fichero se escribe con un
+    buffer grande y sin formatear el mapa, por lo que sirve para trazar busquedas largas y visualizarlas despues
+    """
+
+    def __init__(self, file_name: str, sample: int = TRACE_SAMPLE) -> None:
+        self.file = open(file_name, "w", buffering=TRACE_BUFFER)
+        self.sample = max(sample, 1)
+        self.encoder = json.JSONEncoder(separators=(",", ":"))
+
+    def record(self, expansion: int, state, frontier: int) -> None:
+        if expansion % self.sample:
+            return
+        ambulance = state.ambulance
+        self.file.write(
+            self.encoder.encode(
+                {
+                    "id": expansion,
+                    "f": state.f,
+                    "g": state.g,
+                    "h": state.h,
+                    "pos": ambulance.pos,
+                    "energy": ambulance.energy,
+                    "load": [ambulance.PN, ambulance.PCN, ambulance.PCC],
+                    "delivered": [state.CN, state.CC],
+                    "open": frontier,
+                }
+            )
+        )
+        self.file.write("\n")
+
+    def close(self) -> None:
+        self.file.close()